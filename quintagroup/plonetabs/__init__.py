@@ -4,4 +4,7 @@ messageFactory = MessageFactory('quintagroup.plonetabs')
 
 
 def initialize(context):
-    pass
+    from quintagroup.plonetabs.ordering import installConflictResolution
+    from quintagroup.plonetabs.cache import installModificationEvents
+    installConflictResolution()
+    installModificationEvents()
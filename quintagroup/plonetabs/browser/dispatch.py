@@ -0,0 +1,60 @@
+""" Registry of configlet form handlers. """
+
+
+class HandlersRegistry(object):
+    """Form handlers registry of plonetabs configlet.
+
+    Every handler is registered under operation name and, optionally,
+    under form marker field (e.g. name of submit button). Handler is a
+    name of configlet method or callable taking configlet view as its
+    first argument, followed by the handler arguments.
+
+    Handler for a form is resolved by 'op' field first and then by
+    marker fields in registration order, so resolution cost doesn't
+    depend on the size of submitted form.
+    """
+
+    def __init__(self, *handlers):
+        self._ops = {}
+        self._markers = ()
+        for handler in handlers:
+            self.register(*handler)
+
+    def register(self, op, marker, handler):
+        """Register handler for op operation and marker form field"""
+        self._ops[op] = handler
+        if marker:
+            markers = [m for m in self._markers if m[0] != marker]
+            markers.append((marker, op))
+            self._markers = tuple(markers)
+
+    def operations(self):
+        """Return names of registered operations"""
+        return self._ops.keys()
+
+    def lookup(self, op):
+        """Return handler registered for op operation or None"""
+        return self._ops.get(op)
+
+    def operation(self, form):
+        """Return name of operation requested by submitted form or None"""
+        op = form.get('op')
+        if op in self._ops:
+            return op
+        for marker, op in self._markers:
+            if marker in form:
+                return op
+        return None
+
+    def resolve(self, form):
+        """Return handler for submitted form or None"""
+        op = self.operation(form)
+        if op is None:
+            return None
+        return self._ops[op]
+
+    def dispatch(self, view, handler, *args):
+        """Call resolved handler for view"""
+        if isinstance(handler, basestring):
+            return getattr(view, handler)(*args)
+        return handler(view, *args)
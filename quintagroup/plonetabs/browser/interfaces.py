@@ -14,7 +14,7 @@ class IPloneTabsControlPanel(Interface):
         """Whether there are actions in portal_actions with given category"""
 
     def getPortalActions(category="portal_tabs"):
-        """Return portal actions with given category"""
+        """Return rows of portal actions with given category"""
 
     def isGeneratedTabs():
         """Whether disable_folder_section field is turned off"""
@@ -25,6 +25,32 @@ class IPloneTabsControlPanel(Interface):
     def getActionsList(category="portal_tabs"):
         """Return html code for actions list with given category"""
 
+    def getActionRows(category="portal_tabs", errors={}, tabs=[]):
+        """Return list of rows of actions list with all values looked up"""
+
+    def renderActionRow(row):
+        """Return html code for single row of actions list"""
+
+    def getNavigationFragment(category="portal_tabs"):
+        """Return html code of site navigation showing actions of given
+        category or None, if category isn't shown on site pages
+        """
+
+    def getNavigationFragments(categories):
+        """Return dictionary of html code of site navigation for every
+        given category shown on site pages
+        """
+
+    def getFragmentETag(name, category="portal_tabs"):
+        """Return ETag of configlet fragment with given name, None when it
+        can't be computed
+        """
+
+    def renderFragment(name, category="portal_tabs"):
+        """Return configlet fragment with given name: actionslist,
+        generatedtabs or category
+        """
+
     def getAutoGenereatedSection(cat_name, errors):
         """Return html code for all autogenerated section"""
 
@@ -32,7 +58,7 @@ class IPloneTabsControlPanel(Interface):
         """Return html code for autogenerated tabs"""
 
     def getRootTabs():
-        """Return portal root elements"""
+        """Return rows of portal root elements"""
 
     def getCategories():
         """Return list of categories contained in portal_actions tool"""
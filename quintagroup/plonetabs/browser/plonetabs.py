@@ -1,9 +1,14 @@
 import urllib
 import re
 import json
+import transaction
+from hashlib import md5
 
 from Acquisition import aq_inner
+from AccessControl import getSecurityManager
 from DateTime import DateTime
+from ZODB.POSException import ConflictError
+from ZODB.utils import z64
 
 from zope.interface import implements
 from zope.component import getMultiAdapter
@@ -18,13 +23,15 @@ except ImportError:
     from zope.container.interfaces import INameChooser
 
 from zope.viewlet.interfaces import IViewletManager, IViewlet
+from zope.annotation.interfaces import IAnnotations
 
 from plone.app.layout.navigation.root import getNavigationRoot
+from plone.memoize import ram
+from plone.memoize.view import memoize, ViewMemo
 
 from Products.CMFCore.utils import getToolByName
-from Products.CMFCore.interfaces import IAction, IActionCategory
+from Products.CMFCore.interfaces import IAction
 from Products.CMFCore.ActionInformation import Action, ActionCategory
-from Products.CMFCore.Expression import Expression
 from Products.CMFPlone import utils
 from Products.CMFPlone.browser.navigation import get_view_url
 from Products.Five.browser.pagetemplatefile import ViewPageTemplateFile
@@ -32,10 +39,31 @@ from Products.Five.browser import BrowserView
 from Products.statusmessages.interfaces import IStatusMessage
 
 from quintagroup.plonetabs.config import PROPERTY_SHEET, FIELD_NAME
+from quintagroup.plonetabs.cache import roottabs_counter
+from quintagroup.plonetabs.cache import actionsGeneration
+from quintagroup.plonetabs.cache import bumpActionsGeneration, rootTabsState
+from quintagroup.plonetabs.cache import rootTabsCacheKey
+from quintagroup.plonetabs.cache import tabsCacheKey, categoryIds
+from quintagroup.plonetabs.tabstrie import getTabsTrie
+from quintagroup.plonetabs.listing import listCategoryActions
+from quintagroup.plonetabs.expressions import compileExpression
+from quintagroup.plonetabs.expressions import fixExpression
+from quintagroup.plonetabs.expressions import setActionExpression
 from quintagroup.plonetabs.utils import setupViewletByName
+from quintagroup.plonetabs.browser.dispatch import HandlersRegistry
+from quintagroup.plonetabs.browser.rows import ActionRow, RootTabRow
+from quintagroup.plonetabs.browser.rows import ActionFormRow
 from quintagroup.plonetabs import messageFactory as _
 from interfaces import IPloneTabsControlPanel
 
+try:
+    # Plone 4 and higher
+    import plone.app.upgrade
+    plone.app.upgrade  # pyflakes
+    PLONE4 = True
+except ImportError:
+    PLONE4 = False
+
 ACTION_ATTRS = ["id", "title", "description", "url_expr",
                 "icon_expr", "available_expr", "visible"]
 UI_ATTRS = {"id": "id",
@@ -56,15 +84,131 @@ GENERATED_TABS_FIELDS = {
     ]
 }
 
+# action fields editable in actions list, see templates/actionrow.pt
+ACTION_ROW_FIELDS = ('title', 'description', 'url_expr', 'icon_expr', 'id',
+                     'available_expr')
+
+_marker = object()
+
 bad_id = re.compile(r'[^a-zA-Z0-9-_~,.$\(\)# @]').search
 
 
+def _rootTabsCacheKey(method, self):
+    """Cache key for root tabs records: navigation root, user, query
+    properties and catalog modification counters
+    """
+    context = aq_inner(self.context)
+    return (getNavigationRoot(context),
+            getSecurityManager().getUser().getId()) + rootTabsCacheKey(context)
+
+
+def _titlesCacheKey(method, sheet, charset):
+    """Parsed titles depend on stored state of tabs_properties sheet and
+    charset only, sheet with uncommitted changes is parsed every time
+    """
+    if sheet._p_changed or sheet._p_serial == z64:
+        raise ram.DontCache
+    return ('/'.join(sheet.getPhysicalPath()), sheet._p_serial, charset)
+
+
+def _actionRowCacheKey(method, self, row):
+    """Rendered action row is cached under the key of its row model"""
+    if row.cache_key is None:
+        raise ram.DontCache
+    return row.cache_key
+
+
+@ram.cache(_titlesCacheKey)
+def parseCategoryTitles(sheet, charset):
+    """Return dictionary of decoded categories titles from
+    'category|title' lines of tabs_properties sheet
+    """
+    result = {}
+    for line in sheet.getProperty(FIELD_NAME):
+        cat, title = line.split("|", 2)
+        if not isinstance(title, unicode):
+            title = title.decode(charset)
+        result[cat] = title
+    return result
+
+
+class LazyRootTabs(object):
+    """Sequence of portal root elements.
+
+    Keeps catalog record ids and object ids only, item dictionaries are
+    built from catalog brains when they are accessed for the first time.
+    """
+
+    def __init__(self, view, records):
+        self.view = view
+        self.records = records
+        self._items = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        rid, id_ = self.records[index]
+        item = self._items.get(rid)
+        if item is None:
+            catalog = getToolByName(self.view.context, 'portal_catalog')
+            item = self._items[rid] = self.view.getItem(catalog._catalog[rid])
+        return item
+
+    def __iter__(self):
+        for index in xrange(len(self.records)):
+            yield self[index]
+
+    def ids(self):
+        """Ids of root elements, no catalog brains are touched"""
+        return [id_ for rid, id_ in self.records]
+
+
+class Translator(object):
+    """Translates messages for a single request.
+
+    Translation service is looked up once, translations are cached by
+    message, its domain, default and mapping.
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self.service = getToolByName(context, 'translation_service')
+        self._translations = {}
+
+    def _key(self, message):
+        mapping = getattr(message, 'mapping', None) or {}
+        return (unicode(message), getattr(message, 'domain', None),
+                getattr(message, 'default', None),
+                tuple(sorted(mapping.items())))
+
+    def __call__(self, message):
+        try:
+            key = self._key(message)
+            translation = self._translations.get(key)
+        except (TypeError, UnicodeDecodeError):
+            # unhashable mapping values or non-ascii byte string message,
+            # nothing to cache
+            key = translation = None
+        if translation is None:
+            translation = self.service.translate(message,
+                                                 context=self.context)
+            if key is not None:
+                self._translations[key] = translation
+        return translation
+
+    def translateAll(self, messages):
+        """Translate sequence of messages, return list of translations"""
+        return [self(message) for message in messages]
+
+
 class PloneTabsControlPanel():
 
     implements(IPloneTabsControlPanel)
 
     template = ViewPageTemplateFile("templates/plonetabs.pt")
     actionslist_template = ViewPageTemplateFile("templates/actionslist.pt")
+    actionrow_template = ViewPageTemplateFile("templates/actionrow.pt")
     autogenerated_template = ViewPageTemplateFile("templates/autogenerated.pt")
     autogenerated_list = ViewPageTemplateFile("templates/autogeneratedlist.pt")
 
@@ -75,6 +219,49 @@ class PloneTabsControlPanel():
     prefix = "tabslist_"
     sufix = ""
 
+    # ajax requests handlers: operation, form marker field, method
+    ajax_handlers = HandlersRegistry(
+        ('move', 'edit_moveact', 'manage_ajax_moveAction'),
+        ('category', 'category_change', 'manage_ajax_changeCategory'),
+        ('delete', 'edit_delete', 'manage_ajax_deleteAction'),
+        ('update', 'edit_save', 'manage_ajax_saveAction'),
+        ('cancel', 'edit_cancel', 'manage_ajax_cancelEditting'),
+        ('toggle', 'tabslist_visible', 'manage_ajax_toggleActionsVisibility'),
+        ('roottoggle', 'roottabs_visible',
+         'manage_ajax_toggleRootsVisibility'),
+        ('generated', 'generated_tabs', 'manage_ajax_toggleGeneratedTabs'),
+        ('add', 'add_add', 'manage_ajax_addAction'),
+        ('batch', 'batch', 'manage_ajax_batch'),
+    )
+
+    # ajax operations, which change navigation shown on site pages
+    navigation_ops = ('move', 'delete', 'update', 'toggle', 'add',
+                      'roottoggle', 'generated')
+
+    # viewlets showing actions categories on site pages, portal_tabs are
+    # rendered with sections_template
+    navigation_viewlets = {'site_actions': 'plone.site_actions',
+                           'user': 'plone.personal_bar'}
+
+    # fragments client may fetch with GET and revalidate with ETag:
+    # fragment name, method returning state fragment depends on
+    fragment_states = {'actionslist': '_actionsListState',
+                       'generatedtabs': '_generatedTabsState',
+                       'category': '_categoryState'}
+    fragment_types = {'actionslist': 'text/html',
+                      'generatedtabs': 'text/html',
+                      'category': 'application/json'}
+
+    # submitted forms handlers: operation, submit button name, method
+    submit_handlers = HandlersRegistry(
+        ('add', 'add.add', 'manage_addAction'),
+        ('update', 'edit.save', 'manage_editAction'),
+        ('delete', 'edit.delete', 'manage_deleteAction'),
+        ('moveup', 'edit.moveup', 'manage_moveUpAction'),
+        ('movedown', 'edit.movedown', 'manage_moveDownAction'),
+        ('autogeneration', 'autogenerated.save', 'manage_setAutogeneration'),
+    )
+
     def __call__(self):
         """Perform the update and redirect if necessary, or render the page"""
         postback = True
@@ -84,6 +271,13 @@ class PloneTabsControlPanel():
         form = self.request.form
         submitted = form.get('form.submitted', False)
         ajax_request = form.get('ajax_request', False)
+        fragment = form.get('fragment', None)
+
+        if fragment and not (submitted or ajax_request):
+            content = self.fragment_get(
+                fragment, form.get('category') or 'portal_tabs')
+            if content is not None:
+                return content
 
         # action handler def handler(self, form)
         if ajax_request:
@@ -97,49 +291,104 @@ class PloneTabsControlPanel():
         elif postback:
             return self.template(errors=errors)
 
+    # request annotation key of the translator, it isn't kept in memoize
+    # storage as the latter is cleared when actions are changed
+    translator_key = 'quintagroup.plonetabs.translator'
+
+    def _translator(self):
+        """Translator shared by all handlers of the current request"""
+        annotations = IAnnotations(self.request)
+        translator = annotations.get(self.translator_key)
+        if translator is None:
+            translator = annotations[self.translator_key] = \
+                Translator(self.context)
+        return translator
+
     def translate(self, message):
         """translate message"""
-        ts = getToolByName(self.context, 'translation_service')
-        return ts.translate(message, context=self.context)
+        return self._translator()(message)
+
+    def translateAll(self, messages):
+        """translate list of messages at once"""
+        return self._translator().translateAll(messages)
 
     def submitted_postback(self, form, errors):
         """submitted postback"""
-        if 'add.add' in form.keys():
-            postback = self.manage_addAction(form, errors)
-        elif "edit.save" in form.keys():
-            postback = self.manage_editAction(form, errors)
-        elif "edit.delete" in form.keys():
-            postback = self.manage_deleteAction(form, errors)
-        elif "edit.moveup" in form.keys():
-            postback = self.manage_moveUpAction(form, errors)
-        elif "edit.movedown" in form.keys():
-            postback = self.manage_moveDownAction(form, errors)
-        elif "autogenerated.save" in form.keys():
-            postback = self.manage_setAutogeneration(form, errors)
-        else:
-            postback = True
-        return postback
+        handler = self.submit_handlers.resolve(form)
+        if handler is None:
+            return True
+        return self.submit_handlers.dispatch(self, handler, form, errors)
 
     def ajax_postback(self, form):
         """ajax_postback ajaxback"""
-        conv_dict = {
-            "edit_moveact": "manage_ajax_moveAction",
-            "category_change": "manage_ajax_changeCategory",
-            "edit_delete": "manage_ajax_deleteAction",
-            "edit_save": "manage_ajax_saveAction",
-            "edit_cancel": "manage_ajax_cancelEditting",
-            "tabslist_visible": "manage_ajax_toggleActionsVisibility",
-            "roottabs_visible": "manage_ajax_toggleRootsVisibility",
-            "generated_tabs": "manage_ajax_toggleGeneratedTabs",
-            "add_add": "manage_ajax_addAction",
-        }
-
-        for method in conv_dict.keys():
-            if method in form.keys():
-                method_val = conv_dict.get(method)
-                return getattr(self, method_val)(form)
+        op = self.ajax_handlers.operation(form)
+        if op is None:
+            return False
+        resp_dict = self.ajax_handlers.dispatch(
+            self, self.ajax_handlers.lookup(op), form)
+        if resp_dict.get('status_code') == 200:
+            self._navigationChanged(op, form)
+
+        # send updated navigation along with response, so client doesn't
+        # need to reload the whole page to get it
+        annotations = IAnnotations(self.request)
+        categories = annotations.get(self.navigation_key)
+        if categories:
+            del annotations[self.navigation_key]
+            resp_dict['navigation'] = self.getNavigationFragments(categories)
+        return resp_dict
 
-        return False
+    def fragment_get(self, name, category):
+        """Render fragment requested by client, answer 304 Not Modified
+        when client has its current version already
+        """
+        if name not in self.fragment_types:
+            return None
+        response = self.request.response
+        # client may keep fragment, but must revalidate it every time
+        response.setHeader('Cache-Control', 'private, no-cache')
+        etag = self.getFragmentETag(name, category)
+        if etag is not None:
+            response.setHeader('ETag', etag)
+            if self._etagMatches(etag):
+                response.setStatus(304)
+                return ''
+        response.setHeader('Content-Type', self.fragment_types[name])
+        return self.renderFragment(name, category)
+
+    def _etagMatches(self, etag):
+        """Whether If-None-Match request header lists etag"""
+        header = self.request.getHeader('If-None-Match', '')
+        tags = []
+        for tag in header.split(','):
+            tag = tag.strip()
+            # proxies compressing responses make etags weak
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            tags.append(tag)
+        return etag in tags or '*' in tags
+
+    # request annotation key of categories changed by ajax operations
+    navigation_key = 'quintagroup.plonetabs.navigation'
+
+    def _navigationChanged(self, op, form):
+        """Remember category of actions changed by successful operation"""
+        if op not in self.navigation_ops:
+            return
+        annotations = IAnnotations(self.request)
+        categories = annotations.get(self.navigation_key)
+        if categories is None:
+            categories = annotations[self.navigation_key] = set()
+        categories.add(form.get('category') or 'portal_tabs')
+
+    def _tabsChanged(self):
+        """Forget everything computed for actions during this request and
+        make caches of other requests stale
+        """
+        annotations = IAnnotations(self.request)
+        if ViewMemo.key in annotations:
+            del annotations[ViewMemo.key]
+        bumpActionsGeneration(self.context)
 
     @property
     def plone_portal_state(self):
@@ -235,7 +484,7 @@ class PloneTabsControlPanel():
         checked = True if checked == 'true' else False
 
         if not errors:
-            portal[obj_id].update(excludeFromNav=not checked)
+            self.setExcludeFromNav({obj_id: not checked})
 
             if checked:
                 message = self.translate(
@@ -339,18 +588,16 @@ class PloneTabsControlPanel():
             category = self.getActionCategory(cat_name)
         except Exception:
             errors.append(
-                self.translate(
-                    _(u"'${cat_name}' action category does not exist.",
-                      mapping={'cat_name': cat_name})))
+                _(u"'${cat_name}' action category does not exist.",
+                  mapping={'cat_name': cat_name}))
 
         try:
             action = category[act_id]
         except Exception:
             errors.append(
-                self.translate(
-                    _(u"No '${id}' action in '${cat_name}' category.",
-                      mapping={'id': act_id, 'cat_name': cat_name})))
-        return (act_id, category, action, errors)
+                _(u"No '${id}' action in '${cat_name}' category.",
+                  mapping={'id': act_id, 'cat_name': cat_name}))
+        return (act_id, category, action, self.translateAll(errors))
 
     def manage_ajax_saveAction(self, form):
         """Manage Method to update action"""
@@ -385,18 +632,37 @@ class PloneTabsControlPanel():
         return resp_dict
 
     def manage_ajax_moveAction(self, form):
+        """Move single action right after the action given by 'orig_id'
+        and 'after' fields, to the top of category when 'after' is empty,
+        or sort actions by the whole list of ids
+        """
         cat_name = form['category']
+        if 'after' in form:
+            after = self._removeIdAffixes(form['after']) or None
+            try:
+                resp = self.moveActionAfter(
+                    self._removeIdAffixes(form['orig_id']), cat_name, after)
+            except (KeyError, ValueError):
+                resp = False
+            return self._moveResponse(resp)
+
         category = self.getActionCategory(cat_name)
         components = urllib.unquote(form['actions']).split('&')
-        if self.sufix == '':
-            ids = [component[len(self.prefix):] for component in components]
-        else:
-            ids = [component[len(self.prefix):-len(self.sufix)]
-                   for component in components]
+        ids = [self._removeIdAffixes(component) for component in components]
         # do actual sorting
         resp = category.moveObjectsByDelta(ids, -len(category.objectIds()))
+        return self._moveResponse(resp)
 
+    def _removeIdAffixes(self, html_id):
+        """Remove prefix and sufix, added to action id on configlet page"""
+        if self.sufix == '':
+            return html_id[len(self.prefix):]
+        return html_id[len(self.prefix):-len(self.sufix)]
+
+    def _moveResponse(self, resp):
+        """Response to actions sorting request"""
         if resp:
+            self._tabsChanged()
             resp_dict = {
                 'status_code': 200,
                 'status_message': self.translate(
@@ -410,6 +676,88 @@ class PloneTabsControlPanel():
             }
         return resp_dict
 
+    def manage_ajax_batch(self, form):
+        """Apply list of operations on actions in one request
+
+        'batch' form field holds JSON encoded list of operations, every
+        operation is a dictionary with name of registered ajax operation
+        under 'op' key and the same fields as single ajax request of this
+        operation has.
+        Every operation is applied in its own savepoint, so failed ones
+        do not affect others.
+        """
+        try:
+            operations = json.loads(form['batch'])
+        except ValueError:
+            operations = None
+        if not isinstance(operations, list):
+            return {'status_code': 500,
+                    'status_message': self.translate(
+                        _(u"Invalid operations list."))}
+
+        results = []
+        for operation in operations:
+            results.append(self._applyBatchOperation(operation))
+
+        failed = len([r for r in results if r['status_code'] != 200])
+        if failed:
+            status_code = 500
+            message = _(u"${failed} of ${total} operations failed.",
+                        mapping={'failed': failed, 'total': len(results)})
+        else:
+            status_code = 200
+            message = _(u"${total} operations successfully applied.",
+                        mapping={'total': len(results)})
+        return {'status_code': status_code,
+                'status_message': self.translate(message),
+                'results': results}
+
+    def _applyBatchOperation(self, operation):
+        """Apply single operation of batch request"""
+        form = self._parseBatchOperation(operation)
+        handler = None
+        if form.get('op') != 'batch':
+            handler = self.ajax_handlers.lookup(form.get('op'))
+        if handler is None:
+            return {'status_code': 500,
+                    'status_message': self.translate(
+                        _(u"Unknown '${op}' operation.",
+                          mapping={'op': form.get('op')}))}
+
+        savepoint = transaction.savepoint(optimistic=True)
+        try:
+            resp_dict = self.ajax_handlers.dispatch(self, handler, form)
+        except ConflictError:
+            raise
+        except Exception, e:
+            savepoint.rollback()
+            self._tabsChanged()
+            resp_dict = {'status_code': 500,
+                         'status_message': self._formatError(e)}
+        else:
+            if resp_dict.get('status_code') != 200:
+                savepoint.rollback()
+                self._tabsChanged()
+            else:
+                self._navigationChanged(form.get('op'), form)
+        resp_dict['op'] = form.get('op')
+        return resp_dict
+
+    def _parseBatchOperation(self, operation):
+        """Convert JSON decoded operation to form like dictionary"""
+        charset = self._charset()
+        form = {}
+        if not isinstance(operation, dict):
+            return form
+        for key, value in operation.items():
+            if isinstance(value, bool):
+                # the same way as browser submits checkboxes state
+                value = value and 'true' or 'false'
+            elif isinstance(value, unicode):
+                value = value.encode(charset)
+            form[str(key)] = value
+        return form
+
     def manage_ajax_changeCategory(self, form):
         resp_dict = {}
 
@@ -441,18 +789,11 @@ class PloneTabsControlPanel():
         """Process managing autogeneration settings"""
 
         # set excludeFromNav property for root objects
-        portal = self.plone_portal_state.portal()
         generated_tabs = form.get("generated_tabs", '0')
         nonfolderish_tabs = form.get("nonfolderish_tabs", '0')
 
-        for item in self.getRootTabs():
-            obj = getattr(portal, item['id'], None)
-            if obj is not None:
-                checked = form.get(item['id'], None)
-                if checked == '1':
-                    obj.update(excludeFromNav=False)
-                else:
-                    obj.update(excludeFromNav=True)
+        self.setExcludeFromNav(dict([(id_, form.get(id_, None) != '1')
+                                     for id_ in self.getRootTabs().ids()]))
 
         # set disable_folder_sections property
         if int(generated_tabs) == 1:
@@ -601,6 +942,7 @@ class PloneTabsControlPanel():
     #
     #
 
+    @memoize
     def _charset(self):
         pp = self.portal_properties
         if pp is not None:
@@ -622,20 +964,14 @@ class PloneTabsControlPanel():
         if not hasattr(sheet, FIELD_NAME):
             return default_title
 
-        field = sheet.getProperty(FIELD_NAME)
-        dict = {}
-        for line in field:
-            cat, title = line.split("|", 2)
-            dict[cat] = title
+        # sheet serial is part of cache key, so any committed change of
+        # the sheet makes previously parsed titles unreachable
+        titles = parseCategoryTitles(sheet, self._charset())
 
-        title = dict.get(category, None)
+        title = titles.get(category, None)
         if title is None:
             return default_title
 
-        charset = self._charset()
-        if not isinstance(title, unicode):
-            title = title.decode(charset)
-
         return _(title)
 
     def hasActions(self, category="portal_tabs"):
@@ -653,7 +989,7 @@ class PloneTabsControlPanel():
         actions = []
         for item in portal_actions[category].objectValues():
             if IAction.providedBy(item):
-                actions.append(item)
+                actions.append(self.copyAction(item))
 
         return actions
 
@@ -672,10 +1008,160 @@ class PloneTabsControlPanel():
 
     def getActionsList(self, category="portal_tabs", errors={}, tabs=[]):
         """See interface"""
-        kw = {'category': category, 'errors': errors}
-        if tabs:
-            kw['tabs'] = tabs
-        return self.actionslist_template(**kw)
+        return self.actionslist_template(
+            rows=self.getActionRows(category, errors, tabs))
+
+    def getActionRows(self, category="portal_tabs", errors={}, tabs=[]):
+        """See interface"""
+        category = category or 'portal_tabs'
+        if not tabs:
+            tabs = self.getPortalActions(category)
+
+        # everything rows have in common is looked up once
+        portal_state = self.plone_portal_state
+        portal_url = portal_state.portal_url()
+        language = portal_state.language()
+        form_url = '%s/@@plonetabs-controlpanel' % portal_url
+        request = self.request
+        submitted_id = None
+        if request.get('form.submitted', ''):
+            submitted_id = request.get('orig_id', '')
+
+        rows = []
+        last = len(tabs) - 1
+        for index, tab in enumerate(tabs):
+            if IAction.providedBy(tab):
+                tab = self.copyAction(tab)
+            id_ = tab.id
+            # whether row shows submitted values or validation errors
+            state = submitted_id == id_
+            values = {}
+            row_errors = {}
+            for field in ACTION_ROW_FIELDS:
+                name = '%s_%s' % (field, id_)
+                value = request.get(name, _marker)
+                if value is _marker:
+                    value = getattr(tab, field)
+                else:
+                    state = True
+                values[field] = value
+                row_errors[field] = errors.get(name, '')
+                state = state or bool(row_errors[field])
+
+            if submitted_id == id_:
+                checked = request.form.get('visible_%s' % id_, False)
+            else:
+                checked = tab.visible
+
+            klass = []
+            if not tab.visible:
+                klass.append('invisible')
+            if [error for error in row_errors.values() if error]:
+                # row with validation errors is left open for editing
+                klass.append('editing')
+
+            start, end = index == 0, index == last
+            cache_key = None
+            if not state and tab.serial is not None:
+                cache_key = (tab.path, tab.serial, category, portal_url,
+                             language, start, end)
+
+            rows.append(ActionFormRow(
+                id=id_,
+                html_id=self.prefix + id_,
+                klass=' '.join(klass),
+                title=tab.title,
+                description=tab.description,
+                url_expr=tab.url_expr,
+                checked=checked and 'checked' or None,
+                values=values,
+                errors=row_errors,
+                category=category,
+                form_url=form_url,
+                start=start,
+                end=end,
+                cache_key=cache_key))
+        return rows
+
+    @ram.cache(_actionRowCacheKey)
+    def renderActionRow(self, row):
+        """See interface"""
+        return self.actionrow_template(row=row)
+
+    def getNavigationFragment(self, category="portal_tabs"):
+        """See interface"""
+        if category == 'portal_tabs':
+            return self.sections_template()
+        name = self.navigation_viewlets.get(category)
+        if name is None:
+            return None
+        viewlet = setupViewletByName(self, self.context, self.request, name)
+        if viewlet is None:
+            return None
+        viewlet.update()
+        return viewlet.render()
+
+    def getNavigationFragments(self, categories):
+        """See interface"""
+        fragments = {}
+        for category in categories:
+            fragment = self.getNavigationFragment(category)
+            if fragment is not None:
+                fragments[category] = fragment
+        return fragments
+
+    def getFragmentETag(self, name, category="portal_tabs"):
+        """See interface"""
+        method = self.fragment_states.get(name)
+        if method is None:
+            return None
+        state = getattr(self, method)(category)
+        if state is None:
+            return None
+        portal_state = self.plone_portal_state
+        state = (name, category, state, portal_state.portal_url(),
+                 portal_state.language())
+        return '"%s"' % md5(repr(state)).hexdigest()
+
+    def renderFragment(self, name, category="portal_tabs"):
+        """See interface"""
+        if name == 'actionslist':
+            return self.getActionsList(category)
+        if name == 'generatedtabs':
+            return self.getGeneratedTabs()
+        if name == 'category':
+            return json.dumps(
+                self.manage_ajax_changeCategory({'category': category}))
+        return None
+
+    def _actionsListState(self, category):
+        """Generation of portal actions, None for unknown category"""
+        if category not in self._categoryIds():
+            return None
+        return actionsGeneration(self.context)
+
+    def _generatedTabsState(self, category=None):
+        """Navigation root, user and persistent root tabs state, None when
+        changes of portal root items can't be noticed
+        """
+        context = aq_inner(self.context)
+        catalog = getToolByName(context, 'portal_catalog')
+        if not hasattr(catalog, 'getCounter'):
+            return None
+        userid = getSecurityManager().getUser().getId()
+        return (getNavigationRoot(context), userid) + rootTabsState(context)
+
+    def _categoryState(self, category):
+        """State of everything shown on category change"""
+        actions = self._actionsListState(category)
+        if actions is None:
+            return None
+        section = None
+        if category == 'portal_tabs':
+            section = self._generatedTabsState()
+            if section is None:
+                return None
+        return (actions, section, self.translate(self.getPageTitle(category)))
 
     def getAutoGenereatedSection(self, cat_name, errors={}):
         """See interface"""
@@ -698,18 +1184,41 @@ class PloneTabsControlPanel():
 
     def getRootTabs(self):
         """See interface"""
+        records = self._resolveRootTabs(self._getRootTabsRecords())
+        if records is None:
+            # catalog was changed unnoticed, e.g. on another ZEO client
+            # or by catalog rebuild, query it again
+            roottabs_counter.bump()
+            records = self._resolveRootTabs(self._getRootTabsRecords())
+        return LazyRootTabs(self, records or ())
+
+    def _resolveRootTabs(self, records):
+        """Return (record id, object id) pairs for cached (path, object id)
+        ones, None if any of paths is not cataloged anymore
+        """
+        catalog = getToolByName(aq_inner(self.context), 'portal_catalog')
+        result = []
+        for path, id_ in records:
+            rid = catalog.getrid(path)
+            if rid is None:
+                return None
+            result.append((rid, id_))
+        return tuple(result)
+
+    @ram.cache(_rootTabsCacheKey)
+    def _getRootTabsRecords(self):
+        """Return (path, object id) pairs for portal root elements, record
+        ids are not cached as they differ between catalog rebuilds
+        """
         context = aq_inner(self.context)
 
         portal_catalog = getToolByName(context, 'portal_catalog')
         portal_properties = self.portal_properties
         navtree_properties = getattr(portal_properties, 'navtree_properties')
 
-        # Build result dict
-        result = []
-
         # check whether tabs autogeneration is turned on
         if not self.isGeneratedTabs():
-            return result
+            return ()
 
         query = {}
         rootPath = getNavigationRoot(context)
@@ -735,25 +1244,19 @@ class PloneTabsControlPanel():
 
         rawresult = portal_catalog.searchResults(**query)
 
-        # now add the content to results
-        for item in rawresult:
-            if item.getId not in excludedIds:
-                result.append(self.getItem(item))
-
-        return result
+        # only metadata is read here, brains are converted on demand
+        return tuple([(item.getPath(), item.getId) for item in rawresult
+                      if item.getId not in excludedIds])
 
     def getItem(self, item):
         """get item"""
         context = aq_inner(self.context)
-        id_, item_url = get_view_url(item)
-        data = {
-            'name': utils.pretty_title_or_id(context, item),
-            'id': id_,
-            'url': item_url,
-            'description': item.Description,
-            'exclude_from_nav': item.exclude_from_nav,
-        }
-        return data
+        item_url = get_view_url(item)[1]
+        return RootTabRow(name=utils.pretty_title_or_id(context, item),
+                          id=item.getId,
+                          url=item_url,
+                          description=item.Description,
+                          exclude_from_nav=item.exclude_from_nav)
 
     def getCategories(self):
         """See interface"""
@@ -774,45 +1277,26 @@ class PloneTabsControlPanel():
     # methods for rendering global-sections viewlet via kss,
     # due to bug in macroContent when global-section list is empty,
     # ul have condition
+    @memoize
     def portal_tabs(self):
         """See global-sections viewlet"""
-        actions = getMultiAdapter((self.context, self.request),
-                                  name=u'plone_context_state').actions()
-        actions_tabs = []
-        try:
-            # Plone 4 and higher
-            import plone.app.upgrade
-            plone.app.upgrade  # pyflakes
-        except ImportError:
-            actions_tabs = actions
-        if not actions_tabs and 'portal_tabs' in actions:
-            actions_tabs = actions['portal_tabs']
+        actions_tabs = listCategoryActions(self.context, 'portal_tabs')
+        if not PLONE4:
+            actions_tabs = {'portal_tabs': actions_tabs}
 
         portal_tabs_view = getMultiAdapter((self.context, self.request),
                                            name="portal_tabs_view")
         return portal_tabs_view.topLevelTabs(actions=actions_tabs)
 
+    @memoize
     def selected_portal_tab(self):
         """See global-sections viewlet"""
-        # BBB: compatibility with older plone versions.
-        # ``selectedTabs`` Python script was merged into the
-        # GlobalSectionsViewlet.
-        section_viewlet = setupViewletByName(self,
-                                             self.context,
-                                             self.request,
-                                             'plone.global_sections')
-        if hasattr(section_viewlet, 'selectedTabs'):
-            # Plone >= 4.3
-            selected_tabs = section_viewlet.selectedTabs(
-                default_tab='index_html',
-                portal_tabs=self.portal_tabs())
-        else:
-            # Plone < 4.3
-            selectedTabs = self.context.restrictedTraverse('selectedTabs')
-            selected_tabs = selectedTabs('index_html', self.context,
-                                         self.portal_tabs())
-
-        return selected_tabs['portal']
+        # the same trie is shared with cached global sections viewlet
+        context = aq_inner(self.context)
+        trie = getTabsTrie(tabsCacheKey(context, self.request),
+                           self.plone_portal_state.portal_url(),
+                           self.portal_tabs())
+        return trie.selected(self.request['URL'])
 
     #
     # Utility Methods
@@ -820,36 +1304,28 @@ class PloneTabsControlPanel():
 
     def fixExpression(self, expr):
         """Fix expression appropriately for tal format"""
-        if expr.find('/') == 0:
-            return 'string:${portal_url}%s' % expr
-        elif re.compile('^(ht|f)tps?\:', re.I).search(expr):
-            return 'string:%s' % expr
-        # elif re.compile('^(python:|string:|not:|exists:|nocall:|path:)',
-                        # re.I).search(expr):
-            # return expr
-        elif expr.find(':') != -1:
-            return expr
-        else:
-            return 'string:${object_url}/%s' % expr
+        return fixExpression(expr)
 
     def copyAction(self, action):
-        """Copy action to dictionary"""
-        action_info = {'description': action.description}
-        for attr in ACTION_ATTRS:
-            action_info[attr] = getattr(action, attr)
-        return action_info
+        """Copy action to immutable row"""
+        serial = None
+        if not action._p_changed and action._p_serial != z64:
+            serial = action._p_serial
+        data = dict([(attr, getattr(action, attr)) for attr in ACTION_ATTRS])
+        return ActionRow(path='/'.join(action.getPhysicalPath()),
+                         serial=serial, **data)
 
     def _validate_expression(self, name, data, errors):
         """ validate expression """
         if data[name]:
             try:
-                Expression(data[name])
+                compileExpression(data[name])
             except Exception, e:
                 mapping = {'expr': data[name]}
                 idx = data[name].find(':')
                 if idx != -1:
                     mapping['expr_type'] = data[name][:idx]
-                errors[name] = self._formatError(e, **mapping)
+                errors[name] = self._errorMessage(e, **mapping)
 
     def validateActionFields(self, cat_name, data, allow_dup=False):
         """Check action fields on validity"""
@@ -868,12 +1344,11 @@ class PloneTabsControlPanel():
         try:
             chooser.checkName(data['id'], self.context)
         except Exception, e:
-            errors['id'] = self._formatError(e, **{'id': data['id']})
+            errors['id'] = self._errorMessage(e, **{'id': data['id']})
 
         # validate action name
         if not data['title'].strip():
-            errors['title'] = self.translate(
-                _(u"Empty or invalid title specified"))
+            errors['title'] = _(u"Empty or invalid title specified")
 
         # validate condition expression
         self._validate_expression('available_expr', data, errors)
@@ -884,10 +1359,17 @@ class PloneTabsControlPanel():
         # validate icon expression
         self._validate_expression('icon_expr', data, errors)
 
-        return errors
+        # translate all collected errors at once
+        fields = errors.keys()
+        return dict(zip(fields,
+                        self.translateAll([errors[f] for f in fields])))
 
     def _formatError(self, message, **kw):
         """Make error message a little bit prettier to ease translation"""
+        return self.translate(self._errorMessage(message, **kw))
+
+    def _errorMessage(self, message, **kw):
+        """Convert error to message id ready for translation"""
         charset = self._charset()
         message = str(message)
         message = message.replace('"', "'")
@@ -897,7 +1379,7 @@ class PloneTabsControlPanel():
             # trying to work around zope.i18n issue
             mapping[key] = unicode(value, charset)
         message = message.strip()
-        return self.translate(_(unicode(message, charset), mapping=mapping))
+        return _(unicode(message, charset), mapping=mapping)
 
     def processErrors(self, errors, prefix='', sufix=''):
         """Add prefixes, sufixes to error ids
@@ -957,21 +1439,66 @@ class PloneTabsControlPanel():
         portal_actions = self.portal_actions
         return portal_actions[name]
 
+    @memoize
+    def _categoryIds(self, build=False):
+        """Ids of action categories, see cache.categoryIds"""
+        return categoryIds(self.context, build)
+
     def getOrCreateCategory(self, name):
         """Get or create (if necessary) category"""
-        portal_actions = self.portal_actions
-        if name not in map(lambda x: x.id,
-                           filter(lambda x: IActionCategory.providedBy(x),
-                                  portal_actions.objectValues())):
-            portal_actions._setObject(name, ActionCategory(name))
+        if name not in self._categoryIds(build=True):
+            self.portal_actions._setObject(name, ActionCategory(name))
+            self._tabsChanged()
         return self.getActionCategory(name)
 
     def setSiteProperties(self, **kw):
         """Change site_properties"""
         site_properties = self.portal_properties.site_properties
         site_properties.manage_changeProperties(**kw)
+        self._tabsChanged()
         return True
 
+    def setExcludeFromNav(self, states):
+        """Change excludeFromNav for portal root objects in one batch
+
+        states maps object ids to excludeFromNav values. Only objects
+        with different exclude_from_nav catalog metadata are changed and
+        reindexed. Return list of changed objects ids.
+        """
+        portal = self.plone_portal_state.portal()
+        catalog = getToolByName(self.context, 'portal_catalog')
+
+        current = {}
+        query = {'path': {'query': '/'.join(portal.getPhysicalPath()),
+                          'depth': 1},
+                 'getId': states.keys()}
+        for brain in catalog.unrestrictedSearchResults(**query):
+            current[brain.getId] = brain.exclude_from_nav
+
+        # exclude_from_nav is only metadata column in default catalog,
+        # reindexing of cheap getId index refreshes metadata anyway
+        if 'exclude_from_nav' in catalog.indexes():
+            idxs = ['exclude_from_nav']
+        else:
+            idxs = ['getId']
+
+        changed = []
+        for id_, exclude in states.items():
+            exclude = bool(exclude)
+            if id_ in current and bool(current[id_]) == exclude:
+                continue
+            obj = getattr(portal, id_, None)
+            if obj is None:
+                continue
+            obj.setExcludeFromNav(exclude)
+            catalog.reindexObject(obj, idxs=idxs)
+            changed.append(id_)
+
+        if changed:
+            roottabs_counter.bump()
+            self._tabsChanged()
+        return changed
+
     def renderViewlet(self, manager, name):
         if isinstance(manager, basestring):
             manager = getMultiAdapter((self.context, self.request, self,),
@@ -989,8 +1516,14 @@ class PloneTabsControlPanel():
         """Create and add new action to category with given name"""
         id = data.pop('id')
         category = self.getOrCreateCategory(cat_name)
+        # expressions compiled during validation are reused
+        exprs = dict([(attr, data.pop(attr)) for attr in data.keys()
+                      if attr.endswith('_expr')])
         action = Action(id, **data)
+        for attr, value in exprs.items():
+            setActionExpression(action, attr, value)
         category._setObject(id, action)
+        self._tabsChanged()
         return action
 
     def updateAction(self, id, cat_name, data):
@@ -1007,17 +1540,46 @@ class PloneTabsControlPanel():
 
         # update action properties
         for attr in data.keys():
-            if attr in data:
+            if attr.endswith('_expr'):
+                setActionExpression(action, attr, data[attr])
+            else:
                 action._setPropValue(attr, data[attr])
 
+        self._tabsChanged()
         return action
 
     def deleteAction(self, id, cat_name):
         """Delete action with given id from given category"""
         category = self.getActionCategory(cat_name)
         category.manage_delObjects(ids=[id, ])
+        self._tabsChanged()
+        return True
+
+    def moveActionToPosition(self, id, cat_name, position):
+        """Move action to a given position, only the moved action is
+        looked up and ordering is changed at most once
+        """
+        category = self.getActionCategory(cat_name)
+        if category.getObjectPosition(id) == position:
+            return False
+        category.moveObjectToPosition(id, position)
+        self._tabsChanged()
         return True
 
+    def moveActionAfter(self, id, cat_name, after=None):
+        """Move action right after the given one, to the top of category
+        when it is None. Configlet lists actions only, so the position is
+        found relative to the neighbour action, not counted in the list
+        """
+        category = self.getActionCategory(cat_name)
+        current = category.getObjectPosition(id)
+        position = 0
+        if after is not None:
+            position = category.getObjectPosition(after)
+            if position < current:
+                position += 1
+        return self.moveActionToPosition(id, cat_name, position)
+
     def moveAction(self, id, cat_name, steps=0):
         """Move action by a given steps"""
         if steps != 0:
@@ -1026,5 +1588,6 @@ class PloneTabsControlPanel():
                 category.moveObjectsUp([id, ], steps)
             else:
                 category.moveObjectsDown([id, ], abs(steps))
+            self._tabsChanged()
             return True
         return False
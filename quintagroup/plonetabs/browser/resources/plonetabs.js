@@ -53,30 +53,40 @@ function parseResponse(response, this_event, formData, handler) {
   }
 }
 
-function reloadActions(formData) {
-    switch(formData.category) {
-    case 'portal_tabs':
-        $('#portal-globalnav').load(' #portal-globalnav>*');
-        break;
-    case 'site_actions':
-        $('#portal-siteactions').load(' #portal-siteactions>*');
-        break;
-    case 'user':
-        $('#portal-personaltools ul').load(' #portal-personaltools ul>*');
-        break;
-    default:
-        break;
+// page elements showing actions categories
+var NAVIGATION_SELECTORS = {
+  portal_tabs: '#portal-globalnav',
+  site_actions: '#portal-siteactions',
+  user: '#portal-personaltools ul'
+};
+
+// Replace content of page navigation with fragments rendered by server
+// for changed actions categories
+function updateNavigation(fragments) {
+  if (!fragments) {
+    return;
+  }
+  $.each(fragments, function(category, html) {
+    var selector = NAVIGATION_SELECTORS[category],
+        source;
+    if (!selector) {
+      return;
     }
+    source = $('<div/>').html(html).find(selector).eq(0);
+    if (source.length) {
+      $(selector).html(source.html());
+    }
+  });
 }
 
-function sendRequest(formData, handler, this_event, parse) {
+function sendRequest(formData, handler, this_event, parse, complete) {
   $.ajax({
     type: 'POST',
     url: '@@plonetabs-controlpanel',
     data: formData,
     dataType: 'json',
     success: function(response) {
-      reloadActions(formData);
+      updateNavigation(response.navigation);
       if (parse) {
         parseResponse(response, this_event, formData, handler);
       }
@@ -86,34 +96,270 @@ function sendRequest(formData, handler, this_event, parse) {
     },
     error: function() {
       setStatusMessage('error', 'Server connection error. Please try again');
+    },
+    complete: complete
+  });
+}
+
+/*FRAGMENTS CACHE*/
+
+// Fragments fetched with GET are kept per category and revalidated with
+// their ETag, so server sends them again only when they were changed
+var fragmentsCache = {};
+
+function fetchFragment(name, category, handler) {
+  var key = name + '|' + category,
+      cached = fragmentsCache[key];
+  $.ajax({
+    type: 'GET',
+    url: '@@plonetabs-controlpanel',
+    data: {fragment: name, category: category},
+    dataType: 'text',
+    beforeSend: function(xhr) {
+      if (cached) {
+        xhr.setRequestHeader('If-None-Match', cached.etag);
+      }
+    },
+    complete: function(xhr) {
+      var etag;
+      if (xhr.status === 304 && cached) {
+        handler(cached.content);
+      }
+      else if (xhr.status === 200) {
+        etag = xhr.getResponseHeader('ETag');
+        if (etag) {
+          fragmentsCache[key] = {etag: etag, content: xhr.responseText};
+        }
+        else {
+          delete fragmentsCache[key];
+        }
+        handler(xhr.responseText);
+      }
+      else {
+        setStatusMessage('error', 'Server connection error. Please try again');
+      }
+    }
+  });
+}
+
+/*REQUESTS SCHEDULER*/
+
+// Every change is queued per category in the order it was made and
+// queued changes of category are sent with one batch request at a time.
+// Toggling the same target again replaces its change still waiting in
+// the queue, toggles are sent when nothing was toggled for
+// DEBOUNCE_DELAY milliseconds. Other changes, e.g. moves which depend on
+// each other, are never replaced and are sent at once.
+var DEBOUNCE_DELAY = 300,
+    RETRY_DELAY = 500,
+    MAX_RETRIES = 3,
+    // operations which may be safely sent again after conflict
+    IDEMPOTENT_OPS = {toggle: true, roottoggle: true, generated: true,
+                      move: true},
+    // fields holding new state of toggled target
+    TOGGLE_FIELDS = {toggle: 'visibility', roottoggle: 'visibility',
+                     generated: 'generated_tabs'},
+    categoryQueues = {},
+    categoryTimers = {},
+    categoryRequests = {};
+
+function targetKey(op) {
+  return [op.op, op.category || '', op.orig_id || '', op.field || ''].join('|');
+}
+
+function isConflict(xhr) {
+  return xhr.status === 409 ||
+         (xhr.status >= 500 && /ConflictError/.test(xhr.responseText || ''));
+}
+
+function canRetry(queued, attempt) {
+  if (attempt >= MAX_RETRIES) {
+    return false;
+  }
+  return $.grep(queued, function(item) {
+    return !IDEMPOTENT_OPS[item.op.op];
+  }).length === 0;
+}
+
+function handleResult(item, result) {
+  if (item.parse) {
+    parseResponse(result, item.this_event, item.op, item.handler);
+  }
+  else if (item.handler) {
+    item.handler(result, item.this_event, item.op);
+  }
+}
+
+// Browsers without JSON object, e.g. IE7, can't encode batch, queued
+// operations are sent there one by one with separate requests
+function sendEach(queued, done) {
+  var item = queued[0];
+  if (!item) {
+    done();
+    return;
+  }
+  sendRequest($.extend({ajax_request: true}, item.op), item.handler,
+              item.this_event, item.parse, function(xhr, status) {
+    if (status === 'success') {
+      sendEach(queued.slice(1), done);
+    }
+    else {
+      done();
+    }
+  });
+}
+
+function sendBatch(queued, attempt, done) {
+  var formData = {};
+  if (!window.JSON) {
+    sendEach(queued, done);
+    return;
+  }
+  formData.ajax_request = true;
+  formData.batch = JSON.stringify($.map(queued, function(item) {
+    return item.op;
+  }));
+  $.ajax({
+    type: 'POST',
+    url: '@@plonetabs-controlpanel',
+    data: formData,
+    dataType: 'json',
+    success: function(response) {
+      if (!response.results) {
+        setStatusMessage('error', response.status_message);
+        done();
+        return;
+      }
+      $.each(response.results, function(i, result) {
+        handleResult(queued[i], result);
+      });
+      if (queued.length > 1) {
+        parseResponse(response);
+      }
+      updateNavigation(response.navigation);
+      done();
+    },
+    error: function(xhr) {
+      if (isConflict(xhr) && canRetry(queued, attempt)) {
+        setTimeout(function() {
+          sendBatch(queued, attempt + 1, done);
+        }, RETRY_DELAY * Math.pow(2, attempt));
+        return;
+      }
+      setStatusMessage('error', 'Server connection error. Please try again');
+      done();
     }
   });
 }
 
+// Send everything queued for category, the next request is sent when
+// the previous one is completed
+function sendCategory(category) {
+  var queued = categoryQueues[category] || [];
+  categoryQueues[category] = [];
+  if (!queued.length) {
+    categoryRequests[category] = false;
+    return;
+  }
+  categoryRequests[category] = true;
+  sendBatch(queued, 0, function() {
+    categoryRequests[category] = false;
+    if (!categoryTimers[category]) {
+      sendCategory(category);
+    }
+  });
+}
+
+function flushCategory(category) {
+  clearTimeout(categoryTimers[category]);
+  delete categoryTimers[category];
+  if (!categoryRequests[category]) {
+    sendCategory(category);
+  }
+}
+
+function scheduleCategory(category) {
+  clearTimeout(categoryTimers[category]);
+  categoryTimers[category] = setTimeout(function() {
+    flushCategory(category);
+  }, DEBOUNCE_DELAY);
+}
+
+// Queue operation, handler is called with its result; parse tells to
+// call handler for successful result only and show its status message
+function queueOperation(op, handler, this_event, parse) {
+  var category = op.category || '',
+      field = TOGGLE_FIELDS[op.op],
+      key = targetKey(op),
+      queue = categoryQueues[category] || [],
+      pending = null;
+
+  if (op.op === 'delete') {
+    // visibility of deleted action doesn't matter
+    queue = $.grep(queue, function(item) {
+      return !(TOGGLE_FIELDS[item.op.op] && item.op.orig_id === op.orig_id);
+    });
+  }
+
+  if (field) {
+    $.each(queue, function(i, item) {
+      if (targetKey(item.op) === key) {
+        pending = item;
+      }
+    });
+  }
+
+  if (pending && op[field] === pending.initial) {
+    // target is toggled back to the state server has
+    queue = $.grep(queue, function(item) {
+      return item !== pending;
+    });
+  } else if (pending) {
+    pending.op = op;
+    pending.handler = handler;
+    pending.this_event = this_event;
+  } else {
+    queue.push({
+      op: op,
+      handler: handler,
+      this_event: this_event,
+      parse: parse,
+      initial: field ? !op[field] : null
+    });
+  }
+  categoryQueues[category] = queue;
+
+  if (field) {
+    scheduleCategory(category);
+  } else {
+    flushCategory(category);
+  }
+}
+
 function toggle_handler(response) {
   $('#roottabs').html(response.content);
-  $('#portal-globalnav').load(' #portal-globalnav>*');
 }
 
 //General func for toggleGeneratedTabs and nonfolderish_tabs request
 function sendtoggleRequest(field_name, checked_status) {
-  var formData = {};
-  formData.ajax_request = true;
-  formData.field = field_name;
-  formData.generated_tabs = checked_status;
-  sendRequest(formData, toggle_handler, false, true);
+  var op = {};
+  op.op = 'generated';
+  op.field = field_name;
+  op.generated_tabs = checked_status;
+  queueOperation(op, toggle_handler, false, true);
 }
 
+// Send only moved action and the action it now follows, list positions
+// don't match positions in category, which may have other subobjects
 function sortableList(handler) {
-  var formData = {},
-      liIds = $('#tabslist li').map(function(i, n) {
-        return $(n).attr('id');
-      }).get().join('&');
-  formData.ajax_request = true;
-  formData.category = $('#select_category').val();
-  formData.actions = liIds;
-  formData.edit_moveact = 'Move Action';
-  sendRequest(formData, handler, false, true);
+  var op = {},
+      dragging = plonetabsDnDReorder.dragging,
+      previous = dragging.prev('li');
+  op.op = 'move';
+  op.category = $('#select_category').val();
+  op.orig_id = dragging.attr('id');
+  op.after = previous.length ? previous.attr('id') : '';
+  queueOperation(op, handler, false, true);
 }
 
 function updateSortable() {
@@ -252,7 +498,6 @@ function visibility_handler(response, this_event, formData) {
 }
 
 function roottabs_visibility_handler(response, this_event, formData) {
-  $('#portal-globalnav').load(' #portal-globalnav>*');
   if (formData.visibility === true) {
       this_event.closest('li').removeClass('invisible');
   }
@@ -280,66 +525,61 @@ function add_handler(response) {
 
 //changing category
 $('#select_category').live('change', function(event) {
-    var formData = {};
-    formData.ajax_request = true;
-    formData.category = $(this).val();
-    formData.category_change = 'Change';
-    sendRequest(formData, category_handler, false, false);
+    fetchFragment('category', $(this).val(), function(content) {
+        category_handler($.parseJSON(content));
+    });
 });
 
 //save(edit)
 $('#tabslist .editsave').live('click', function(event) {
     event.preventDefault();
-    var formData = $(this).closest('form').serializeObject();
+    var op = $(this).closest('form').serializeObject();
 //     var parentFormSelect = $(this).closest('li');
-    formData.edit_save = this.value;
-    formData.ajax_request = true;
-    sendRequest(formData, edit_handler, $(this), false);
+    op.op = 'update';
+    op.edit_save = this.value;
+    queueOperation(op, edit_handler, $(this), false);
 });
 
 //reset(cancel)
 $('#tabslist .editcancel').live('click', function(event) {
     event.preventDefault();
-    var formData = {}, parentFormSelect = $(this).closest('li');
-    formData.ajax_request = true;
-    formData.edit_cancel = 'Cancel';
-    formData.orig_id = parentFormSelect.find('.editform input[name="orig_id"]').val();
-    formData.category = parentFormSelect.find('.editform input[name="category"]').val();
-    sendRequest(formData, reset_handler, $(this), true);
+    var op = {}, parentFormSelect = $(this).closest('li');
+    op.op = 'cancel';
+    op.edit_cancel = 'Cancel';
+    op.orig_id = parentFormSelect.find('.editform input[name="orig_id"]').val();
+    op.category = parentFormSelect.find('.editform input[name="category"]').val();
+    queueOperation(op, reset_handler, $(this), true);
 });
 
 //delete
 $('#tabslist .delete').live('click', function(event) {
     event.preventDefault();
-    var formData = {}, parentFormSelect = $(this).closest('li');
-    formData.ajax_request = true;
-    formData.edit_delete = 'Delete';
-    formData.orig_id = parentFormSelect.find('.editform input[name="orig_id"]').val();
-    formData.category = parentFormSelect.find('.editform input[name="category"]').val();
-    sendRequest(formData, delete_handler, $(this), true);
+    var op = {}, parentFormSelect = $(this).closest('li');
+    op.op = 'delete';
+    op.orig_id = parentFormSelect.find('.editform input[name="orig_id"]').val();
+    op.category = parentFormSelect.find('.editform input[name="category"]').val();
+    queueOperation(op, delete_handler, $(this), true);
 });
 
 //visibility
 $('#tabslist input.visibility').live('click', function(event) {
-    var formData = {}, parentFormSelect = $(this).closest('li');
-    formData.ajax_request = true;
-    formData.tabslist_visible = 'Set visibillity';
-    formData.orig_id = parentFormSelect.find('.editform input[name="orig_id"]').val();
-    formData.category = parentFormSelect.find('.editform input[name="category"]').val();
-    formData.visibility = $(this).is(':checked');
-    sendRequest(formData, visibility_handler, $(this), true);
+    var op = {}, parentFormSelect = $(this).closest('li');
+    op.op = 'toggle';
+    op.orig_id = parentFormSelect.find('.editform input[name="orig_id"]').val();
+    op.category = parentFormSelect.find('.editform input[name="category"]').val();
+    op.visibility = $(this).is(':checked');
+    queueOperation(op, visibility_handler, $(this), true);
 });
 
 //portal_tabs methods
 
 //visibility
 $('#roottabs .visibility').live('click', function(event) {
-    var formData = {}, parentFormSelect = $(this).closest('li');
-    formData.ajax_request = true;
-    formData.roottabs_visible = 'Visibillity';
-    formData.orig_id = parentFormSelect.attr('id');
-    formData.visibility = $(this).is(':checked');
-    sendRequest(formData, roottabs_visibility_handler, $(this), true);
+    var op = {}, parentFormSelect = $(this).closest('li');
+    op.op = 'roottoggle';
+    op.orig_id = parentFormSelect.attr('id');
+    op.visibility = $(this).is(':checked');
+    queueOperation(op, roottabs_visibility_handler, $(this), true);
 });
 
 //toggleGeneratedTabs
@@ -372,9 +612,9 @@ $('#buttoncancel').live('click', function(event) {
 //add
 $('#buttonadd').live('click', function(event) {
     event.preventDefault();
-    var formData = $(this).closest('form').serializeObject();
-    formData.add_add = this.value;
-    formData.ajax_request = true;
-    formData.category = $('#select_category').val();
-    sendRequest(formData, add_handler, false, false);
+    var op = $(this).closest('form').serializeObject();
+    op.op = 'add';
+    op.add_add = this.value;
+    op.category = $('#select_category').val();
+    queueOperation(op, add_handler, false, false);
 });
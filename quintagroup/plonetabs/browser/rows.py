@@ -0,0 +1,99 @@
+""" Compact rows of configlet actions and root tabs lists. """
+
+
+class Row(object):
+    """Immutable record with fixed set of fields.
+
+    Values are kept in __slots__, so row takes much less memory than
+    dictionary with the same data and is read with plain attribute
+    access. Item access and keys() are supported for code written for
+    dictionaries.
+    """
+
+    __slots__ = ()
+
+    # names of data fields, __slots__ may hold some extra attributes
+    fields = ()
+
+    def __init__(self, **kw):
+        setter = object.__setattr__
+        for name in self.__slots__:
+            setter(self, name, kw.pop(name, None))
+        if kw:
+            raise TypeError("Unknown %s fields: %s"
+                            % (self.__class__.__name__, ', '.join(kw)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % self.__class__.__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError("%s is immutable" % self.__class__.__name__)
+
+    def __getitem__(self, name):
+        if name not in self.fields:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def get(self, name, default=None):
+        if name not in self.fields:
+            return default
+        return getattr(self, name)
+
+    def keys(self):
+        return list(self.fields)
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.fields]
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return [getattr(self, n) for n in self.__slots__] == \
+            [getattr(other, n) for n in other.__slots__]
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__,
+                            ' '.join(['%s=%r' % item
+                                      for item in self.items()]))
+
+
+class ActionRow(Row):
+    """Portal action copied from portal_actions tool.
+
+    path and serial identify copied persistent action, serial is None
+    when action has changes which aren't committed yet.
+    """
+
+    fields = ('id', 'title', 'description', 'url_expr', 'icon_expr',
+              'available_expr', 'visible')
+    __slots__ = fields + ('path', 'serial')
+
+
+class RootTabRow(Row):
+    """Portal root element shown in generated tabs list"""
+
+    fields = ('id', 'name', 'url', 'description', 'exclude_from_nav')
+    __slots__ = fields
+
+
+class ActionFormRow(Row):
+    """Row of actions list with all values needed by edit form.
+
+    values and errors map action fields to values shown in the form and
+    to validation errors, cache_key is None for rows which must not be
+    cached.
+    """
+
+    fields = ('id', 'html_id', 'klass', 'title', 'description', 'url_expr',
+              'checked', 'values', 'errors', 'category', 'form_url',
+              'start', 'end', 'cache_key')
+    __slots__ = fields
@@ -0,0 +1,59 @@
+""" Global sections viewlet rendered from RAM cache. """
+from Acquisition import aq_inner
+
+from zope.component import getMultiAdapter
+
+from plone.app.layout.viewlets.common import GlobalSectionsViewlet
+from plone.memoize import ram
+
+from quintagroup.plonetabs.cache import tabsCacheKey
+from quintagroup.plonetabs.listing import listCategoryActions
+from quintagroup.plonetabs.tabstrie import getTabsTrie
+from quintagroup.plonetabs.browser.plonetabs import PLONE4
+
+
+def _tabsCacheKey(method, self):
+    """Tabs are shared by all pages of navigation root"""
+    return self.cache_key
+
+
+def _sectionsCacheKey(method, self):
+    """Rendered tabs differ by selected tab only"""
+    return (self.cache_key, self.selected_portal_tab)
+
+
+class CachedGlobalSectionsViewlet(GlobalSectionsViewlet):
+    """Drop-in replacement of plone.global_sections viewlet.
+
+    Tabs and rendered html are computed again only when portal actions
+    or navigation root items are changed, so expressions of portal_tabs
+    actions must not depend on context other than navigation root.
+    """
+
+    def update(self):
+        context = aq_inner(self.context)
+        self.cache_key = tabsCacheKey(context, self.request)
+        self.portal_tabs = self.getPortalTabs()
+        portal_state = getMultiAdapter((context, self.request),
+                                       name=u'plone_portal_state')
+        trie = getTabsTrie(self.cache_key, portal_state.portal_url(),
+                           self.portal_tabs)
+        self.selected_tabs = {'portal': trie.selected(self.request['URL'])}
+        self.selected_portal_tab = self.selected_tabs['portal']
+
+    @ram.cache(_tabsCacheKey)
+    def getPortalTabs(self):
+        """Top level tabs, the same as computed by base viewlet"""
+        context = aq_inner(self.context)
+        actions_tabs = listCategoryActions(context, 'portal_tabs')
+        if not PLONE4:
+            actions_tabs = {'portal_tabs': actions_tabs}
+
+        portal_tabs_view = getMultiAdapter((context, self.request),
+                                           name='portal_tabs_view')
+        # cached tabs are shared between requests
+        return tuple(portal_tabs_view.topLevelTabs(actions=actions_tabs))
+
+    @ram.cache(_sectionsCacheKey)
+    def render(self):
+        return super(CachedGlobalSectionsViewlet, self).render()
@@ -0,0 +1,295 @@
+""" This module dedicated to keep plonetabs caches up to date. """
+from threading import Lock
+
+from Acquisition import aq_base, aq_inner, aq_parent
+from AccessControl import getSecurityManager
+from BTrees.Length import Length
+from BTrees.OOBTree import OOTreeSet
+
+from zope.component import getMultiAdapter
+from zope.event import notify
+from zope.lifecycleevent import ObjectModifiedEvent
+from zope.lifecycleevent.interfaces import IObjectMovedEvent
+
+from plone.app.layout.navigation.interfaces import INavigationRoot
+from plone.app.layout.navigation.root import getNavigationRoot
+from plone.memoize import ram
+
+from Products.CMFCore.interfaces import ISiteRoot
+from Products.CMFCore.interfaces import IActionCategory, IActionsTool
+from Products.CMFCore.utils import getToolByName
+from Products.CMFCore.ActionInformation import Action
+
+# properties root tabs query and urls depend on
+ROOT_TABS_SITE_PROPERTIES = ('disable_folder_sections',
+                             'disable_nonfolderish_sections',
+                             'typesUseViewActionInListings')
+ROOT_TABS_NAVTREE_PROPERTIES = ('sortAttribute', 'sortOrder',
+                                'enable_wf_state_filtering',
+                                'wf_states_to_show', 'idsNotToList',
+                                'metaTypesNotToList')
+
+
+class Counter(object):
+    """ In-memory counter used as a part of cache keys.
+
+    Bumping the counter makes all cache entries computed with its previous
+    value unreachable.
+    """
+
+    def __init__(self):
+        self.value = 0
+        self._lock = Lock()
+
+    def bump(self):
+        with self._lock:
+            self.value += 1
+        return self.value
+
+
+# changed whenever direct children of any navigation root are changed
+roottabs_counter = Counter()
+
+# portal_actions attribute keeping persistent generation of actions
+GENERATION_ATTR = '_plonetabs_generation'
+
+# changed whenever actions generation is bumped in this process
+actions_counter = Counter()
+
+
+def actionsGeneration(context):
+    """ Generation of portal actions, changed whenever they are changed.
+
+    Generation is stored in ZODB, so all ZEO clients see it changed along
+    with actions and it is safe to derive ETags from it. Counter serial
+    keeps generation unique when undo reverts the counter to one of its
+    previous values.
+    """
+    tool = getToolByName(context, 'portal_actions', None)
+    if tool is None:
+        return (0, None)
+    counter = getattr(aq_base(tool), GENERATION_ATTR, None)
+    if counter is None:
+        return (0, None)
+    return (counter(), counter._p_serial)
+
+
+def actionsCacheKey(context):
+    """ Actions generation for RAM cache keys. In-process counter keeps key
+    unique when savepoint rollback reverts uncommitted bump and generation
+    is bumped again within the same transaction.
+    """
+    return actionsGeneration(context) + (actions_counter.value, )
+
+
+def bumpActionsGeneration(context):
+    """ Make everything cached for previous actions generation stale """
+    tool = getToolByName(context, 'portal_actions', None)
+    if tool is None:
+        # actions tool itself is being constructed
+        return
+    counter = getattr(aq_base(tool), GENERATION_ATTR, None)
+    if counter is None:
+        counter = Length()
+        setattr(tool, GENERATION_ATTR, counter)
+    # concurrent changes of Length are resolved without conflicts
+    counter.change(1)
+    actions_counter.bump()
+
+
+# portal_actions attribute keeping ids of actions categories
+CATEGORIES_ATTR = '_plonetabs_categories'
+
+
+def _scanCategories(tool):
+    return [id_ for id_, obj in tool.objectItems()
+            if IActionCategory.providedBy(obj)]
+
+
+def buildCategoriesIndex(context):
+    """ Build index of actions categories ids, loading all categories """
+    tool = getToolByName(context, 'portal_actions')
+    index = OOTreeSet(_scanCategories(tool))
+    setattr(tool, CATEGORIES_ATTR, index)
+    return index
+
+
+def categoryIds(context, build=False):
+    """ Ids of actions categories from index kept in sync by
+    categoryMoved, so categories are not loaded to check their existence.
+
+    Sites without index yet have categories scanned, unless build is true,
+    which stores index for the next calls.
+    """
+    tool = getToolByName(context, 'portal_actions')
+    index = getattr(aq_base(tool), CATEGORIES_ATTR, None)
+    if index is not None:
+        return index
+    if build:
+        return buildCategoriesIndex(tool)
+    return frozenset(_scanCategories(tool))
+
+
+def categoryMoved(obj, event):
+    """ Update index of categories ids when category is added to, removed
+    from or renamed in portal_actions
+    """
+    for parent in (event.oldParent, event.newParent):
+        if parent is None or not IActionsTool.providedBy(parent):
+            continue
+        index = getattr(aq_base(parent), CATEGORIES_ATTR, None)
+        if index is None:
+            # categories are already changed, so index is built correct
+            buildCategoriesIndex(parent)
+            continue
+        if parent is event.oldParent and event.oldName in index:
+            index.remove(event.oldName)
+        if parent is event.newParent and event.newName is not None:
+            index.insert(event.newName)
+
+
+def rootTabsState(context):
+    """ Catalog counter and properties root tabs query depends on, all of
+    them stored in ZODB
+    """
+    portal_properties = getToolByName(context, 'portal_properties')
+    site_props = portal_properties.site_properties
+    navtree_props = portal_properties.navtree_properties
+    catalog = getToolByName(context, 'portal_catalog')
+    # catalog counter is available since Products.ZCatalog 2.13
+    catalog_counter = None
+    if hasattr(catalog, 'getCounter'):
+        catalog_counter = catalog.getCounter()
+    return ([site_props.getProperty(p, None)
+             for p in ROOT_TABS_SITE_PROPERTIES],
+            [navtree_props.getProperty(p, None)
+             for p in ROOT_TABS_NAVTREE_PROPERTIES],
+            catalog_counter)
+
+
+def rootTabsCacheKey(context):
+    """ Root tabs state for RAM cache keys. In-process counter notices
+    changes of root items in catalogs without counter.
+    """
+    return rootTabsState(context) + (roottabs_counter.value, )
+
+
+def isNavigationRoot(obj):
+    """ Whether object is a root for site navigation """
+    return INavigationRoot.providedBy(obj) or ISiteRoot.providedBy(obj)
+
+
+def rootTabsChanged(obj, event):
+    """ Invalidate cached root tabs if navigation root child was changed.
+
+    Handles added, moved, removed, modified and workflow transitioned
+    content objects.
+    """
+    if IObjectMovedEvent.providedBy(event):
+        parents = (event.oldParent, event.newParent)
+    else:
+        parents = (aq_parent(aq_inner(obj)), )
+
+    for parent in parents:
+        if parent is not None and isNavigationRoot(parent):
+            roottabs_counter.bump()
+            break
+
+
+def _sharedItemsCacheKey(method, context, root, userid):
+    """ Shared items are changed along with root tabs """
+    return (root, userid) + rootTabsCacheKey(context)
+
+
+@ram.cache(_sharedItemsCacheKey)
+def hasSharedRootItems(context, root, userid):
+    """ Whether local roles on any of navigation root items are granted to
+    the user directly, not to user's roles or groups
+    """
+    catalog = getToolByName(context, 'portal_catalog')
+    return len(catalog.unrestrictedSearchResults(
+        path={'query': root, 'depth': 1},
+        allowedRolesAndUsers='user:%s' % userid)) > 0
+
+
+def userCacheKey(context, portal):
+    """ Roles and groups of current user tabs depend on.
+
+    Users with the same roles on portal and the same groups share tabs,
+    unless navigation root items are shared with the user directly.
+    """
+    user = getSecurityManager().getUser()
+    roles = tuple(sorted(user.getRolesInContext(portal)))
+    if 'Anonymous' in roles:
+        return (roles, (), None)
+    groups = ()
+    if hasattr(aq_base(user), 'getGroups'):
+        groups = tuple(sorted(user.getGroups()))
+    userid = user.getId()
+    if not hasSharedRootItems(context, getNavigationRoot(context), userid):
+        userid = None
+    return (roles, groups, userid)
+
+
+def tabsCacheKey(context, request):
+    """ Key of top level tabs shown in context navigation root.
+
+    Tabs depend on actions, root items, urls, user roles and language,
+    provided that portal_tabs actions expressions don't depend on other
+    context.
+    """
+    portal_state = getMultiAdapter((context, request),
+                                   name=u'plone_portal_state')
+    return (actionsCacheKey(context),
+            rootTabsCacheKey(context),
+            portal_state.portal_url(),
+            portal_state.navigation_root_url(),
+            userCacheKey(context, portal_state.portal()),
+            portal_state.language())
+
+
+def actionsChanged(obj, event):
+    """ Bump actions generation when action or actions category is added,
+    removed, moved, modified or reordered.
+    """
+    context = obj
+    if IObjectMovedEvent.providedBy(event):
+        context = event.newParent or event.oldParent or obj
+    bumpActionsGeneration(context)
+
+
+def profileImported(event):
+    """ Bump actions generation after GenericSetup import, which may
+    change actions without any events
+    """
+    bumpActionsGeneration(event.tool)
+
+
+def _notifyModified(method):
+    def wrapper(self, *args, **kw):
+        result = method(self, *args, **kw)
+        notify(ObjectModifiedEvent(self))
+        return result
+    wrapper.__name__ = method.__name__
+    # published methods must have docstring
+    wrapper.__doc__ = method.__doc__
+    wrapper._plonetabs_notifies = True
+    return wrapper
+
+
+# methods of Action patched by installModificationEvents
+MODIFICATION_METHODS = ('manage_editProperties', 'manage_changeProperties')
+
+
+def installModificationEvents():
+    """ Notify modification of actions edited with their ZMI properties
+    form, PropertyManager doesn't do that.
+
+    Action class is patched on Zope startup, so actions of all sites in
+    the process notify ObjectModifiedEvent after these methods.
+    """
+    for name in MODIFICATION_METHODS:
+        method = getattr(Action, name).im_func
+        if getattr(method, '_plonetabs_notifies', False):
+            continue
+        setattr(Action, name, _notifyModified(method))
@@ -1,2 +1,5 @@
 PROPERTY_SHEET = "tabs_properties"
 FIELD_NAME = "titles"
+
+# maximum number of compiled TALES expressions kept in memory
+EXPRESSIONS_CACHE_SIZE = 1000
@@ -0,0 +1,216 @@
+""" This module dedicated to work with actions TALES expressions. """
+import re
+from threading import Lock
+
+from Acquisition import aq_base
+
+from Products.CMFCore.Expression import Expression, getEngine
+
+from quintagroup.plonetabs.config import EXPRESSIONS_CACHE_SIZE
+
+
+# Forms of url typed by user, recognized with single match:
+#  - portal: path relative to portal root ('/about')
+#  - url: absolute url ('http://plone.org')
+#  - typed: TALES expression with type prefix ('python:...', 'string:...')
+# anything else is treated as a path relative to current object
+expression_form = re.compile(r'^(?:(?P<portal>/)|(?P<url>(?:ht|f)tps?:)|'
+                             r'(?P<typed>[^:]*:))', re.I).match
+
+EXPRESSION_TEMPLATES = {
+    'portal': 'string:${portal_url}%s',
+    'url': 'string:%s',
+    'typed': '%s',
+    'object': 'string:${object_url}/%s',
+}
+
+
+def getExpressionForm(expr):
+    """ Return name of expression form, see expression_form """
+    match = expression_form(expr)
+    if match is None:
+        return 'object'
+    return match.lastgroup
+
+
+def fixExpression(expr):
+    """ Fix expression appropriately for tal format """
+    return EXPRESSION_TEMPLATES[getExpressionForm(expr)] % expr
+
+
+# String expressions depending on portal or navigation root url only:
+#  - constant: 'string:http://plone.org'
+#  - portal: 'string:${portal_url}/about'
+#  - navroot: 'string:${globals_view/navigationRootUrl}/about'
+# the rest of expression must not contain any variables
+url_expression_form = re.compile(
+    r'^string:(?:\$\{(?:(?P<portal>portal_url)|'
+    r'(?P<navroot>globals_view/navigationRootUrl))\})?'
+    r'(?P<suffix>[^$\r\n]*)\Z').match
+
+
+def classifyExpression(text):
+    """ Return (kind, suffix) pair for expression, which depends on portal
+    or navigation root url only, see url_expression_form. Return None for
+    any other expression.
+    """
+    match = url_expression_form(text)
+    if match is None:
+        return None
+    if match.group('portal'):
+        kind = 'portal'
+    elif match.group('navroot'):
+        kind = 'navroot'
+    else:
+        kind = 'constant'
+    return kind, match.group('suffix')
+
+
+class FoldedExpression(object):
+    """ Compiled expression resolved without TALES engine.
+
+    Url is taken from expression context variables and suffix is appended
+    to it, compiled expression is evaluated only when context doesn't
+    have the url.
+    """
+
+    def __init__(self, kind, suffix, compiled):
+        self.kind = kind
+        self.suffix = suffix
+        self.compiled = compiled
+
+    def __call__(self, econtext):
+        if self.kind == 'constant':
+            return self.suffix
+        data = getattr(econtext, 'vars', None) or {}
+        base = None
+        if self.kind == 'portal':
+            base = data.get('portal_url')
+        else:
+            globals_view = data.get('globals_view')
+            if globals_view is not None:
+                base = globals_view.navigationRootUrl()
+        if not isinstance(base, basestring):
+            return self.compiled(econtext)
+        return base + self.suffix
+
+
+class LRUCache(object):
+    """ Bounded mapping, which forgets least recently used keys first """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._lock = Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # circular doubly linked list of [prev, next, key, value] links
+            self._root = root = []
+            root[:] = [root, root, None, None]
+            self._links = {}
+
+    def __len__(self):
+        return len(self._links)
+
+    def __contains__(self, key):
+        return key in self._links
+
+    def get(self, key, default=None):
+        with self._lock:
+            link = self._links.get(key)
+            if link is None:
+                return default
+            # move link to the most recently used end
+            prev, next = link[0], link[1]
+            prev[1], next[0] = next, prev
+            root = self._root
+            last = root[0]
+            last[1] = root[0] = link
+            link[0], link[1] = last, root
+            return link[3]
+
+    def set(self, key, value):
+        with self._lock:
+            link = self._links.get(key)
+            if link is not None:
+                link[3] = value
+                return
+            root = self._root
+            if len(self._links) >= self.maxsize:
+                # drop least recently used link
+                oldest = root[1]
+                root[1], oldest[1][0] = oldest[1], root
+                del self._links[oldest[2]]
+            last = root[0]
+            link = [last, root, key, value]
+            last[1] = root[0] = self._links[key] = link
+
+
+# expression properties of actions
+ACTION_EXPRESSIONS = ('url_expr', 'icon_expr', 'available_expr')
+
+# expression text -> compiled expression or compilation error
+compiled_expressions = LRUCache(EXPRESSIONS_CACHE_SIZE)
+
+
+def compileExpression(text):
+    """ Compile TALES expression, using cache shared by the whole process.
+
+    Compilation errors are cached as well and raised again on every call.
+    """
+    compiled = compiled_expressions.get(text)
+    if compiled is None:
+        try:
+            compiled = getEngine().compile(text)
+        except Exception, e:
+            compiled = e
+        else:
+            folded = classifyExpression(text)
+            if folded is not None:
+                compiled = FoldedExpression(folded[0], folded[1], compiled)
+        compiled_expressions.set(text, compiled)
+    if isinstance(compiled, Exception):
+        raise compiled
+    return compiled
+
+
+def makeExpression(text):
+    """ Create CMF Expression object with compiled code from the cache """
+    expr = Expression('')
+    expr.text = text
+    if text.strip():
+        expr._v_compiled = compileExpression(text)
+    return expr
+
+
+def setActionExpression(action, name, text):
+    """ Set expression property of action without compiling it again """
+    setattr(action, name, text)
+    attr = '%s_object' % name
+    if text:
+        setattr(action, attr, makeExpression(text))
+    elif getattr(aq_base(action), attr, None) is not None:
+        delattr(action, attr)
+
+
+def foldActionsExpressions(actions):
+    """ Let expressions of actions loaded from ZODB share code compiled
+    once per process instead of being compiled by CMF in every thread, and
+    url expressions depending on portal or navigation root url only be
+    resolved without TALES engine.
+
+    Compiled expression is kept in volatile attribute, so it is lost when
+    expression is deactivated.
+    """
+    for action in actions:
+        action = aq_base(action)
+        for name in ACTION_EXPRESSIONS:
+            expr = getattr(action, '%s_object' % name, None)
+            if expr is None or not expr.text:
+                continue
+            try:
+                expr._v_compiled = compileExpression(expr.text)
+            except Exception:
+                # CMF reports the error when expression is evaluated
+                continue
@@ -0,0 +1,93 @@
+""" This module dedicated to list available actions of a category. """
+from Acquisition import aq_inner
+
+from Products.CMFCore.ActionInformation import ActionInfo
+from Products.CMFCore.Expression import getExprContext
+from Products.CMFCore.interfaces import IAction
+from Products.CMFCore.utils import _checkPermission, getToolByName
+
+from quintagroup.plonetabs.expressions import foldActionsExpressions
+
+
+def isUnconditional(action):
+    """ Action without condition is available in any context """
+    return not getattr(action, 'available_expr', '')
+
+
+def _permissionContext(ec, category):
+    """ Object permissions of action are checked on, the same as in
+    ActionInfo._checkPermissions
+    """
+    obj = ec.contexts['object']
+    if obj is not None and \
+       category.startswith(('object', 'workflow', 'document')):
+        return obj
+    folder = ec.contexts['folder']
+    if folder is not None and category.startswith('folder'):
+        return folder
+    return ec.contexts['portal']
+
+
+def _checkPermissions(permissions, context):
+    if not permissions:
+        return True
+    for permission in permissions:
+        if _checkPermission(permission, context):
+            return True
+    return False
+
+
+def listCategoryActions(context, category='portal_tabs'):
+    """ Return visible, allowed and available actions of category, the
+    same as listFilteredActionsFor does for that category. Actions of
+    subcategories are listed by CMF under their own categories, so only
+    direct actions of category are taken.
+
+    Unconditional actions are not wrapped in ActionInfo: their url and
+    icon expressions are evaluated at once and permissions are checked
+    once for every set of permissions, as all actions of the category
+    are checked on the same object. Conditional actions and actions of
+    other providers go through CMF as usual.
+    """
+    context = aq_inner(context)
+    tool = getToolByName(context, 'portal_actions')
+    ec = getExprContext(tool, context)
+    result = []
+    if category in tool.objectIds():
+        # expressions of invisible actions are never evaluated
+        actions = [action for action in tool[category].objectValues()
+                   if IAction.providedBy(action) and action.visible]
+        foldActionsExpressions(actions)
+        allowed = {}
+        for action in actions:
+            if not isUnconditional(action):
+                info = ActionInfo(action, ec)
+                if info['allowed'] and info['available']:
+                    result.append(info)
+                continue
+            data, lazy_keys = action.getInfoData()
+            permissions = tuple(data.pop('permissions', ()))
+            if permissions not in allowed:
+                obj = _permissionContext(ec, data['category'])
+                allowed[permissions] = _checkPermissions(permissions, obj)
+            if not allowed[permissions]:
+                continue
+            for key in lazy_keys:
+                data[key] = data[key](ec)
+            data['available'] = data['allowed'] = True
+            result.append(data)
+
+    for provider_id in tool.listActionProviders():
+        if provider_id == 'portal_actions':
+            continue
+        provider = getToolByName(context, provider_id, None)
+        if provider is None:
+            continue
+        # checks are postponed to be done for category actions only
+        for info in provider.listActionInfos(object=context,
+                                             check_permissions=0,
+                                             check_condition=0):
+            if info['category'] == category and info['allowed'] and \
+               info['available']:
+                result.append(info)
+    return result
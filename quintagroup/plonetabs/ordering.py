@@ -0,0 +1,148 @@
+""" This module dedicated to resolve conflicts of concurrent changes of
+actions categories: reordering, addition and removal of actions.
+"""
+from difflib import SequenceMatcher
+
+from ZODB.ConflictResolution import PersistentReference
+from ZODB.POSException import ConflictError
+
+from Products.CMFCore.ActionInformation import ActionCategory
+
+_missing = object()
+
+
+def movedIds(old_ids, new_ids):
+    """ Return ids of new_ids, which were added or moved relative to other
+    ids of old_ids, in new_ids order
+    """
+    kept = set()
+    matcher = SequenceMatcher(None, old_ids, new_ids)
+    for i, j, size in matcher.get_matching_blocks():
+        kept.update(new_ids[j:j + size])
+    return [id_ for id_ in new_ids if id_ not in kept]
+
+
+def mergeOrder(old_ids, saved_ids, new_ids):
+    """ Three-way merge of concurrently changed ids orderings.
+
+    Additions, removals and moves made in saved and new orderings are
+    merged, if they touch different ids, otherwise ConflictError is raised.
+    """
+    removed = (set(old_ids) - set(saved_ids)) | (set(old_ids) - set(new_ids))
+    saved_moved = movedIds(old_ids, saved_ids)
+    new_moved = movedIds(old_ids, new_ids)
+    changed = set(saved_moved) | set(new_moved)
+    if set(saved_moved) & set(new_moved) or changed & removed:
+        raise ConflictError
+
+    result = [id_ for id_ in old_ids
+              if id_ not in removed and id_ not in changed]
+    for ids, moved, other in ((saved_ids, saved_moved, new_moved),
+                              (new_ids, new_moved, saved_moved)):
+        moved, other = set(moved), set(other)
+        for index, id_ in enumerate(ids):
+            if id_ not in moved:
+                continue
+            # place id right after its nearest predecessor, which
+            # wasn't moved by concurrent change
+            position = 0
+            for previous in reversed(ids[:index]):
+                if previous in result and previous not in other:
+                    position = result.index(previous) + 1
+                    break
+            result.insert(position, id_)
+    return result
+
+
+def _referencedOid(reference):
+    """ Oid of persistent reference, older ZODB references keep it in data
+    only
+    """
+    oid = getattr(reference, 'oid', None)
+    if oid is None:
+        oid = reference.data
+        if isinstance(oid, tuple):
+            oid = oid[0]
+    return oid
+
+
+def _sameValue(one, other):
+    """ Compare attribute values of states. Persistent references can't be
+    compared with other values and are the same, if they refer to the same
+    object.
+    """
+    if one is other:
+        return True
+    if isinstance(one, PersistentReference) or \
+       isinstance(other, PersistentReference):
+        return isinstance(one, PersistentReference) and \
+            isinstance(other, PersistentReference) and \
+            _referencedOid(one) == _referencedOid(other)
+    try:
+        return bool(one == other)
+    except Exception:
+        # values holding persistent references
+        return False
+
+
+def _mergeValue(old, saved, new):
+    """ Three-way merge of a single attribute value, _missing stands for
+    attribute added or removed by one of the changes
+    """
+    if _sameValue(saved, new):
+        return saved
+    if _sameValue(saved, old):
+        return new
+    if _sameValue(new, old):
+        return saved
+    raise ConflictError
+
+
+def resolveOrderingConflict(self, oldState, savedState, newState):
+    """ Resolve conflicting changes of ordered folder state.
+
+    Changes of different attributes and independent additions, removals
+    and moves of subobjects are merged.
+    """
+    for state in (oldState, savedState, newState):
+        if not isinstance(state, dict):
+            raise ConflictError
+
+    # attribute missing in some state was added or removed by the change,
+    # it is merged as any other change of attribute
+    result = {}
+    for key in set(oldState) | set(savedState) | set(newState):
+        if key == '_objects':
+            continue
+        value = _mergeValue(oldState.get(key, _missing),
+                            savedState.get(key, _missing),
+                            newState.get(key, _missing))
+        if value is not _missing:
+            result[key] = value
+
+    infos = {}
+    orders = []
+    for state in (oldState, savedState, newState):
+        objects = state.get('_objects', ())
+        for info in objects:
+            infos[info['id']] = info
+        orders.append([info['id'] for info in objects])
+    ids = mergeOrder(*orders)
+    for id_ in ids:
+        if id_ not in result:
+            raise ConflictError
+    result['_objects'] = tuple([infos[id_] for id_ in ids])
+    return result
+
+
+def installConflictResolution():
+    """ Let actions categories resolve conflicting concurrent changes.
+
+    ActionCategory class is patched, so the resolution applies to all
+    categories (and categories of subclasses, which don't resolve
+    conflicts themselves) in every database of the process. Resolver
+    defined by CMF, if any, is kept.
+    """
+    if '_p_resolveConflict' in ActionCategory.__dict__:
+        return
+    ActionCategory._p_resolveConflict = resolveOrderingConflict
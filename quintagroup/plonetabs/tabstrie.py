@@ -0,0 +1,61 @@
+""" This module dedicated to find portal tab selected for request URL. """
+from plone.memoize import ram
+
+# trie node key of tab id, path segments are strings
+_TAB = None
+
+
+class TabsTrie(object):
+    """ Trie of portal tabs paths relative to portal url.
+
+    Tab is selected when its path followed by slash is a prefix of
+    request URL path, the longest such path wins, as in selectedTabs of
+    global sections viewlet. Paths are split into segments by slashes,
+    so tab is found in time proportional to URL path depth instead of
+    number of tabs.
+    """
+
+    def __init__(self, portal_url, tabs):
+        self.portal_url = portal_url
+        self._root = {}
+        for tab in tabs:
+            url = tab['url']
+            if not url.startswith(portal_url):
+                # external link is never selected
+                continue
+            path = url[len(portal_url):]
+            if not path.startswith('/'):
+                path = '/' + path
+            node = self._root
+            for segment in path.split('/'):
+                node = node.setdefault(segment, {})
+            # of tabs with the same path the one with greatest id wins
+            if node.get(_TAB) is None or tab['id'] > node[_TAB]:
+                node[_TAB] = tab['id']
+
+    def selected(self, url, default_tab='index_html'):
+        """ Return id of tab selected for given URL """
+        segments = url[len(self.portal_url):].split('/')
+        selected = default_tab
+        node = self._root
+        # tab path must be followed by at least one more segment
+        for segment in segments[:-1]:
+            node = node.get(segment)
+            if node is None:
+                break
+            if node.get(_TAB) is not None:
+                selected = node[_TAB]
+        return selected
+
+
+def _trieCacheKey(method, key, portal_url, tabs):
+    """ Tabs are the same for the same tabs cache key """
+    return key
+
+
+@ram.cache(_trieCacheKey)
+def getTabsTrie(key, portal_url, tabs):
+    """ Return trie of tabs built once per tabs cache key, see
+    cache.tabsCacheKey
+    """
+    return TabsTrie(portal_url, tabs)
@@ -0,0 +1,7 @@
+""" Benchmarks compare timings, which depend on machine load, so they are
+added to test suites only when PLONETABS_BENCHMARKS environment variable
+is set.
+"""
+import os
+
+BENCHMARKS = bool(os.environ.get('PLONETABS_BENCHMARKS'))
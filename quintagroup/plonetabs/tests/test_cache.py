@@ -0,0 +1,92 @@
+import unittest
+import transaction
+
+from zope.component import getMultiAdapter
+
+from Products.CMFCore.utils import getToolByName
+from Products.CMFCore.ActionInformation import Action
+
+from quintagroup.plonetabs.cache import actionsGeneration, actionsCacheKey
+from quintagroup.plonetabs.cache import actions_counter, roottabs_counter
+from quintagroup.plonetabs.cache import rootTabsState, rootTabsCacheKey
+from quintagroup.plonetabs.cache import bumpActionsGeneration
+from quintagroup.plonetabs.tests.base import PloneTabsTestCase
+
+
+class TestActionsGeneration(PloneTabsTestCase):
+    """Test here persistent generation of portal actions"""
+
+    def afterSetUp(self):
+        super(TestActionsGeneration, self).afterSetUp()
+        self.loginAsPortalOwner()
+        self.tool = getToolByName(self.portal, 'portal_actions')
+        self.purgeActions()
+        self.setupActions(self.tool)
+        panel = getMultiAdapter((self.portal, self.portal.REQUEST),
+                                name='plonetabs-controlpanel')
+        self.panel = panel.__of__(self.portal)
+
+    def failUnlessBumps(self, change, *args, **kw):
+        generation = actionsGeneration(self.portal)
+        change(*args, **kw)
+        self.assertNotEquals(actionsGeneration(self.portal), generation,
+                             '%s did not change actions generation.'
+                             % change.__name__)
+
+    def test_bump(self):
+        self.failUnlessBumps(bumpActionsGeneration, self.portal)
+        # generation is kept on actions tool
+        self.failUnless(self.tool._plonetabs_generation() > 0)
+
+    def test_savepointRollback(self):
+        key = actionsCacheKey(self.portal)
+        savepoint = transaction.savepoint()
+        bumpActionsGeneration(self.portal)
+        bumped = actionsCacheKey(self.portal)
+        savepoint.rollback()
+        bumpActionsGeneration(self.portal)
+        self.failIf(actionsCacheKey(self.portal) in (key, bumped),
+                    'Cache key was reused after savepoint rollback.')
+
+    def test_persistentState(self):
+        # ETags are derived from state all ZEO clients share
+        generation = actionsGeneration(self.portal)
+        key = actionsCacheKey(self.portal)
+        actions_counter.bump()
+        self.assertEquals(actionsGeneration(self.portal), generation)
+        self.assertNotEquals(actionsCacheKey(self.portal), key)
+
+        state = rootTabsState(self.portal)
+        key = rootTabsCacheKey(self.portal)
+        roottabs_counter.bump()
+        self.assertEquals(rootTabsState(self.portal), state)
+        self.assertNotEquals(rootTabsCacheKey(self.portal), key)
+
+    def test_configletChanges(self):
+        ids = self.tool.portal_tabs.objectIds()
+        self.failUnlessBumps(self.panel.moveActionToPosition,
+                             ids[-1], 'portal_tabs', 0)
+        self.failUnlessBumps(self.panel.deleteAction, ids[0], 'portal_tabs')
+        self.failUnlessBumps(self.panel.setSiteProperties,
+                             disable_folder_sections=True)
+
+    def test_containerEvents(self):
+        category = self.tool.portal_tabs
+        self.failUnlessBumps(category._setObject, 'new', Action('new'))
+        self.failUnlessBumps(category.moveObjectToPosition, 'new', 0)
+        self.failUnlessBumps(category._delObject, 'new')
+
+    def test_propertiesEdit(self):
+        action = self.tool.portal_tabs.objectValues()[0]
+        self.failUnlessBumps(action.manage_changeProperties, title='ZMI')
+
+    def test_profileImport(self):
+        setup = getToolByName(self.portal, 'portal_setup')
+        self.failUnlessBumps(setup.runImportStepFromProfile,
+                             'profile-Products.CMFPlone:plone', 'actions')
+
+
+def test_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestActionsGeneration))
+    return suite
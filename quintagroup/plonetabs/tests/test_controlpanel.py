@@ -1,19 +1,51 @@
+import json
 import unittest
+import time
 
-from zope.interface import Interface
+from Acquisition import aq_base
+
+from zope.interface import Interface, alsoProvides
 from zope.interface.verify import verifyClass
 from zope.component import getMultiAdapter, provideAdapter
 
+from plone.memoize.ram import DontCache
+
 from Products.CMFCore.utils import getToolByName
-from Products.CMFCore.ActionInformation import Action
+from Products.CMFCore.ActionInformation import Action, ActionCategory
+from Products.CMFCore.interfaces import IActionCategory
+from Products.Five.browser.pagetemplatefile import ViewPageTemplateFile
+from OFS.Folder import Folder
 
 from quintagroup.plonetabs import messageFactory as _
 from quintagroup.plonetabs.browser.interfaces import IPloneTabsControlPanel
 from quintagroup.plonetabs.browser.plonetabs \
     import PloneTabsControlPanel as ptp
+from quintagroup.plonetabs.browser.plonetabs import _titlesCacheKey
+from quintagroup.plonetabs.cache import categoryIds
+from quintagroup.plonetabs.cache import actions_counter, roottabs_counter
 from quintagroup.plonetabs.tests.base import PloneTabsTestCase
+from quintagroup.plonetabs.tests.benchmarks import BENCHMARKS
 from quintagroup.plonetabs.tests.data import PORTAL_ACTIONS
 
+# number of actions in actions list benchmark
+BENCHMARK_ACTIONS = 150
+
+# actions list template as it was before rows, every action is rendered
+# within the same template
+nested_actionslist = ViewPageTemplateFile('nestedactionslist.pt')
+
+class CustomCategory(ActionCategory):
+    """Actions category of custom meta type"""
+    meta_type = 'Custom Action Category'
+
+
+def addActions(category, number):
+    for i in range(number):
+        category._setObject('action%d' % i,
+                            Action('action%d' % i, title='Action %d' % i,
+                                   url_expr='string:/action%d' % i,
+                                   visible=bool(i % 2)))
+
 
 class TestControlPanelHelperMethods(PloneTabsTestCase):
     """Test here configlet helper methods"""
@@ -168,6 +200,47 @@ class TestControlPanelHelperMethods(PloneTabsTestCase):
         self.assertEquals(response['status_code'], 200)
         self.assertEquals(response['status_message'], u"Actions successfully sorted.")
 
+    def test_ajax_moveAction_after(self):
+        category = self.tool.site_actions
+        # subobjects other than actions are not listed in configlet
+        category._setObject('sub', ActionCategory('sub'))
+        category.moveObjectToPosition('sub', 0)
+        form = {
+            'op': 'move',
+            'category': 'site_actions',
+            'orig_id': 'tabslist_contact',
+            'after': 'tabslist_accessibility',
+        }
+        # action is already there
+        response = self.panel.ajax_postback(form)
+        self.assertEquals(response['status_code'], 500)
+
+        form['after'] = ''
+        response = self.panel.ajax_postback(form)
+        self.assertEquals(response['status_code'], 200)
+        self.assertEquals(category.objectIds()[:4],
+                          ['contact', 'sub', 'sitemap', 'accessibility'])
+
+        form['after'] = 'tabslist_sitemap'
+        response = self.panel.ajax_postback(form)
+        self.assertEquals(response['status_code'], 200)
+        self.assertEquals(category.objectIds()[:4],
+                          ['sub', 'sitemap', 'contact', 'accessibility'])
+
+        form['orig_id'] = 'tabslist_accessibility'
+        response = self.panel.ajax_postback(form)
+        self.assertEquals(response['status_code'], 200)
+        self.assertEquals(category.objectIds()[:4],
+                          ['sub', 'sitemap', 'accessibility', 'contact'])
+
+        form['after'] = 'tabslist_missing'
+        response = self.panel.ajax_postback(form)
+        self.assertEquals(response['status_code'], 500)
+        form['orig_id'] = 'tabslist_missing'
+        form['after'] = ''
+        response = self.panel.ajax_postback(form)
+        self.assertEquals(response['status_code'], 500)
+
     def test_ajax_addAction(self):
         form = {
             'add_add': 'Add',
@@ -212,6 +285,89 @@ class TestControlPanelHelperMethods(PloneTabsTestCase):
         self.assertEquals(response['status_code'], 200)
         self.assertEquals(response['status_message'], u"'contact' action is now visible.")
 
+    def test_ajax_navigation(self):
+        form = {
+            'category': 'site_actions',
+            'orig_id': 'contact',
+            'tabslist_visible': 'Set visibillity',
+            'visibility': 'false'
+        }
+        response = self.panel.ajax_postback(form)
+        fragment = response['navigation']['site_actions']
+        self.failUnless('portal-siteactions' in fragment)
+        self.failIf('siteaction-contact' in fragment,
+                    'Navigation fragment was rendered before change.')
+
+        form = {
+            'orig_id': 'roottabs_news',
+            'roottabs_visible': 'Visibillity',
+            'visibility': 'false'
+        }
+        response = self.panel.ajax_postback(form)
+        fragment = response['navigation']['portal_tabs']
+        self.failUnless('portal-globalnav' in fragment)
+        self.failIf('portaltab-news' in fragment)
+
+        # failed and not changing operations don't render navigation
+        form['orig_id'] = 'roottabs_invalid'
+        self.failIf('navigation' in self.panel.ajax_postback(form))
+        form = {
+            'category': 'site_actions',
+            'edit_cancel': 'Cancel',
+            'orig_id': 'contact',
+        }
+        self.failIf('navigation' in self.panel.ajax_postback(form))
+
+    def test_ajax_batch(self):
+        form = {'batch': 'invalid json'}
+        response = self.panel.ajax_postback(form)
+        self.assertEquals(response['status_code'], 500)
+        self.assertEquals(response['status_message'],
+                          u"Invalid operations list.")
+
+        operations = [
+            {'op': 'toggle', 'category': 'site_actions',
+             'orig_id': 'contact', 'visibility': False},
+            {'op': 'delete', 'category': 'site_actions',
+             'orig_id': 'sitemap'},
+            {'op': 'add', 'category': 'site_actions', 'id': 'action_id',
+             'title': 'action title', 'description': '', 'url_expr': '',
+             'icon_expr': '', 'available_expr': '', 'visible': 1},
+        ]
+        form = {'batch': json.dumps(operations)}
+        response = self.panel.ajax_postback(form)
+        self.assertEquals(response['status_code'], 200)
+        self.assertEquals(response['status_message'],
+                          u"3 operations successfully applied.")
+        self.assertEquals([r['op'] for r in response['results']],
+                          ['toggle', 'delete', 'add'])
+        category = self.tool.site_actions
+        self.failIf(category.contact.visible)
+        self.failIf('sitemap' in category.objectIds())
+        self.failUnless('action_id' in category.objectIds())
+        self.failUnless('class="editform"' in
+                        response['results'][2]['content'])
+        # navigation is rendered once for the whole batch
+        self.assertEquals(response['navigation'].keys(), ['site_actions'])
+        self.failIf('navigation' in response['results'][0])
+
+        # failed operations are reported and do not break others
+        operations = [
+            {'op': 'unknown'},
+            {'op': 'delete', 'category': 'site_actions',
+             'orig_id': 'sitemap'},
+            {'op': 'toggle', 'category': 'site_actions',
+             'orig_id': 'contact', 'visibility': True},
+        ]
+        form = {'batch': json.dumps(operations)}
+        response = self.panel.ajax_postback(form)
+        self.assertEquals(response['status_code'], 500)
+        self.assertEquals(response['status_message'],
+                          u"2 of 3 operations failed.")
+        self.assertEquals([r['status_code'] for r in response['results']],
+                          [500, 500, 200])
+        self.failUnless(category.contact.visible)
+
     def test_redirect(self):
         response = self.portal.REQUEST.RESPONSE
         method = self.panel.redirect
@@ -278,6 +434,39 @@ class TestControlPanelHelperMethods(PloneTabsTestCase):
                           'properly.')
         #### pyflakes.scripts.pyflakes ends.
 
+    def test_translate(self):
+        ts = getToolByName(self.portal, 'translation_service')
+        calls = []
+        original = ts.translate
+
+        def translate(*args, **kw):
+            calls.append(args)
+            return original(*args, **kw)
+
+        ts.translate = translate
+        try:
+            first = _(u"'${id}' action successfully removed.",
+                      mapping={'id': 'first'})
+            second = _(u"'${id}' action successfully removed.",
+                       mapping={'id': 'second'})
+            self.assertEquals(self.panel.translate(first),
+                              u"'first' action successfully removed.")
+            self.assertEquals(self.panel.translateAll([first, second]),
+                              [u"'first' action successfully removed.",
+                               u"'second' action successfully removed."])
+        finally:
+            del ts.translate
+
+        self.assertEquals(len(calls), 2,
+                          'Translations are not cached during request.')
+
+    def test_translate_nonAscii(self):
+        # byte string messages are translated without caching
+        ts = getToolByName(self.portal, 'translation_service')
+        message = 'Caf\xc3\xa9'
+        self.assertEquals(self.panel.translate(message),
+                          ts.translate(message, context=self.portal))
+
     def test_processErrors(self):
         method = self.panel.processErrors
         errors = {'error': 'error message'}
@@ -349,6 +538,83 @@ class TestControlPanelHelperMethods(PloneTabsTestCase):
         self.assertEquals(method('portal_tabs').id, 'portal_tabs',
                           'getOrCreateCategory is not working properly.')
 
+    def test_setExcludeFromNav(self):
+        method = self.panel.setExcludeFromNav
+        self.setupContent(self.portal)
+        self.assertEquals(method({'folder1': False, 'document1': False}), [],
+                          'Objects with unchanged value should not be '
+                          'touched.')
+        self.assertEquals(method({'folder1': True, 'document1': False}),
+                          ['folder1'])
+        self.failUnless(self.portal.folder1.exclude_from_nav())
+        self.failIf(self.portal.document1.exclude_from_nav())
+
+        # catalog metadata is updated as well
+        catalog = getToolByName(self.portal, 'portal_catalog')
+        brain = catalog(getId='folder1')[0]
+        self.failUnless(brain.exclude_from_nav)
+        self.assertEquals(method({'folder1': True}), [])
+
+    def test_getOrCreateCategory_customCategory(self):
+        self.purgeActions()
+        self.tool._setObject('custom', CustomCategory('custom'))
+        self.failUnless(self.panel.getOrCreateCategory('custom') is not None)
+        self.failUnless(isinstance(self.tool.custom, CustomCategory))
+
+    def test_getOrCreateCategory_providedCategory(self):
+        # category interface provided by instance, not by its class
+        self.purgeActions()
+        folder = Folder('provided')
+        alsoProvides(folder, IActionCategory)
+        self.tool._setObject('provided', folder)
+        category = self.panel.getOrCreateCategory('provided')
+        self.failUnless(aq_base(category) is folder)
+
+    def test_categoriesIndex(self):
+        self.purgeActions()
+        self.tool._setObject('one', ActionCategory('one'))
+        self.tool._setObject('two', ActionCategory('two'))
+        self.tool.manage_renameObject('two', 'three')
+        self.tool._delObject('one')
+        # actions are not categories
+        self.tool._setObject('action', Action('action'))
+        self.assertEquals(list(categoryIds(self.portal)), ['three'])
+
+    def _lookupTime(self, categories):
+        """Create given number of categories and return time of 2000
+        existence checks of categories, unloaded from ZODB
+        """
+        import transaction
+        method = self.panel.getOrCreateCategory
+        self.purgeActions()
+        for i in range(categories):
+            id = 'category%d' % i
+            self.tool._setObject(id, ActionCategory(id))
+        transaction.savepoint(optimistic=True)
+        for category in self.tool.objectValues():
+            category._p_deactivate()
+        self.purgeCache(self.portal.REQUEST)
+
+        start = time.time()
+        for i in range(1000):
+            method('category1')
+            method('new_category')
+        return time.time() - start
+
+    def test_getOrCreateCategory_manyCategories(self):
+        few = min([self._lookupTime(5) for i in range(3)])
+        many = min([self._lookupTime(550) for i in range(3)])
+        ghosts = [c for c in self.tool.objectValues()
+                  if c._p_changed is None]
+        self.failUnless(len(ghosts) >= 549,
+                        'Unrelated categories were loaded from ZODB.')
+        self.assertEquals(len(self.tool.objectIds()), 551)
+        # look-up time doesn't depend on number of categories
+        self.failUnless(many < few * 5,
+                        '2000 category look-ups among 550 categories took '
+                        '%.3f seconds, among 5 categories %.3f seconds.'
+                        % (many, few))
+
     def test_setSiteProperties(self):
         self.panel.setSiteProperties(title='Test Title')
         sp = getToolByName(self.portal, 'portal_properties').site_properties
@@ -454,6 +720,29 @@ class TestControlPanelAPIMethods(PloneTabsTestCase):
                             mapping={'cat_name': 'notexists'}),
                           'getPageTitle method is broken')
 
+    def test_getPageTitle_cache(self):
+        sheet = getToolByName(self.portal, 'portal_properties').tabs_properties
+        titles = sheet.getProperty('titles')
+        self.assertEquals(self.panel.getPageTitle('user'),
+                          _(u"Plone '${cat_name}' Configuration",
+                            mapping={'cat_name': 'user'}))
+
+        # changed sheet is parsed again
+        sheet.manage_changeProperties(
+            titles=titles + ('user|User Actions Configuration', ))
+        self.assertEquals(self.panel.getPageTitle('user'),
+                          _(u"User Actions Configuration"),
+                          'Cached titles were not invalidated after '
+                          'tabs_properties sheet change.')
+
+    def test_getPageTitle_cacheKey(self):
+        sheet = getToolByName(self.portal, 'portal_properties').tabs_properties
+        key = _titlesCacheKey(None, sheet, 'utf-8')
+        self.assertEquals(key, ('/'.join(sheet.getPhysicalPath()),
+                                sheet._p_serial, 'utf-8'))
+        sheet.manage_changeProperties(titles=('user|User', ))
+        self.assertRaises(DontCache, _titlesCacheKey, None, sheet, 'utf-8')
+
     def test_hasActions(self):
         method = self.panel.hasActions
         # purge any default portal actions
@@ -507,6 +796,66 @@ class TestControlPanelAPIMethods(PloneTabsTestCase):
         self.failUnless('class="editform"' in method(),
                         'There are no actions in actions list template.')
 
+    def test_getActionRows(self):
+        method = self.panel.getActionRows
+        self.purgeActions()
+        self.setupActions(self.tool)
+        rows = method('portal_tabs')
+        self.assertEquals([row['id'] for row in rows],
+                          self.tool.portal_tabs.objectIds())
+        row = rows[0]
+        self.assertEquals(row['values']['title'], 'Our home')
+        self.assertEquals(row['form_url'], self.portal.absolute_url() +
+                          '/@@plonetabs-controlpanel')
+        self.failUnless(row['start'] and not row['end'])
+        self.failIf('editing' in row['klass'].split())
+
+        # submitted values and errors are shown in the row left open
+        self.panel.request.form['title_home'] = 'Submitted'
+        errors = {'url_expr_home': 'Error'}
+        row = method('portal_tabs', errors=errors)[0]
+        self.assertEquals(row['values']['title'], 'Submitted')
+        self.assertEquals(row['errors']['url_expr'], 'Error')
+        self.assertEquals(row['cache_key'], None)
+        self.failUnless('editing' in row['klass'].split())
+        content = self.panel.getActionsList('portal_tabs', errors=errors)
+        self.failUnless('editing' in content)
+
+    def test_getActionsList_manyActions(self):
+        self.purgeActions()
+        addActions(self.tool.portal_tabs, 150)
+        content = self.panel.getActionsList('portal_tabs')
+        self.assertEquals(content.count('class="editform"'), 150)
+        self.assertEquals(content.count('class="invisible"'), 75)
+
+    def test_renderActionRow_cache(self):
+        self.purgeActions()
+        self.setupActions(self.tool)
+        action = self.tool.portal_tabs.objectValues()[0]
+
+        def render():
+            row = self.panel.getActionRows('portal_tabs', tabs=[action])[0]
+            return self.panel.renderActionRow(row)
+
+        self.failUnless('>Our home<' in render())
+
+        # not committed actions are rendered every time
+        action.title = 'Changed'
+        self.failUnless('>Changed<' in render())
+
+        # emulate committed action
+        action._p_serial = '\0' * 7 + '\1'
+        action._p_changed = False
+        render()
+        action.__dict__['title'] = 'Cached'
+        self.failUnless('>Changed<' in render(),
+                        'Action row was not cached.')
+
+        # committed changes are rendered again
+        action._p_serial = '\0' * 7 + '\2'
+        self.failUnless('>Cached<' in render(),
+                        'Cached action row was not invalidated.')
+
     def test_getAutoGenereatedSection(self):
         method = self.panel.getAutoGenereatedSection
         self.failIf('<form' in method('user'),
@@ -518,11 +867,57 @@ class TestControlPanelAPIMethods(PloneTabsTestCase):
 
     def test_getGeneratedTabs(self):
         self.panel.getGeneratedTabs()
-        # check expiration header set by generated tabs template
-        self.assertEquals(
-            self.portal.REQUEST.RESPONSE.headers.get('expires', ''),
-            'Mon, 26 Jul 1996 05:00:00 GMT',
-            'Expiration header is not set properly.')
+        # fragments are revalidated with ETag instead of expiring
+        self.failIf('expires' in self.portal.REQUEST.RESPONSE.headers,
+                    'Expiration header is set by generated tabs template.')
+
+    def test_getFragmentETag(self):
+        method = self.panel.getFragmentETag
+        self.purgeActions()
+        self.setupActions(self.tool)
+        etag = method('actionslist', 'portal_tabs')
+        self.failUnless(etag.startswith('"') and etag.endswith('"'))
+        self.assertEquals(method('actionslist', 'portal_tabs'), etag)
+        self.assertNotEquals(method('category', 'portal_tabs'), etag)
+
+        # in-process counters differ between ZEO clients
+        category = method('category', 'portal_tabs')
+        actions_counter.bump()
+        roottabs_counter.bump()
+        self.assertEquals(method('actionslist', 'portal_tabs'), etag)
+        self.assertEquals(method('category', 'portal_tabs'), category)
+
+        ids = self.tool.portal_tabs.objectIds()
+        self.panel.moveActionToPosition(ids[-1], 'portal_tabs', 0)
+        self.assertNotEquals(method('actionslist', 'portal_tabs'), etag)
+
+        self.assertEquals(method('actionslist', 'unknown'), None)
+        self.assertEquals(method('unknown', 'portal_tabs'), None)
+
+    def test_fragment_get(self):
+        self.purgeActions()
+        self.setupActions(self.tool)
+        request = self.portal.REQUEST
+        response = request.RESPONSE
+        content = self.panel.fragment_get('actionslist', 'portal_tabs')
+        self.failUnless('class="editform"' in content)
+        etag = response.getHeader('etag')
+        self.assertEquals(etag,
+                          self.panel.getFragmentETag('actionslist',
+                                                     'portal_tabs'))
+
+        # client already has current version of the fragment
+        request.environ['HTTP_IF_NONE_MATCH'] = 'W/%s' % etag
+        try:
+            content = self.panel.fragment_get('actionslist', 'portal_tabs')
+            self.assertEquals(content, '')
+            self.assertEquals(response.getStatus(), 304)
+        finally:
+            del request.environ['HTTP_IF_NONE_MATCH']
+            response.setStatus(200)
+
+        self.assertEquals(self.panel.fragment_get('unknown', 'portal_tabs'),
+                          None)
 
     def test_getRootTabs(self):
         method = self.panel.getRootTabs
@@ -543,6 +938,54 @@ class TestControlPanelAPIMethods(PloneTabsTestCase):
                           'There should be no root elements for navigation '
                           'when tabs autogeneration is switched off.')
 
+    def test_getRootTabs_cache(self):
+        method = self.panel._getRootTabsRecords
+        self.setupContent(self.portal)
+        records = method()
+        self.failUnless(method() is records,
+                        'Root tabs should be cached.')
+
+        # excluding root element from navigation invalidates cache
+        self.portal.folder1.update(excludeFromNav=True)
+        self.failIf(method() is records,
+                    'Cached root tabs were not invalidated after root '
+                    'element modification.')
+        excluded = [t['exclude_from_nav'] for t in self.panel.getRootTabs()
+                    if t['id'] == 'folder1']
+        self.assertEquals(excluded, [True])
+
+        # new root element invalidates cache too
+        records = method()
+        self._createType(self.portal, 'Folder', 'folder2')
+        self.assertEquals(len(method()), len(records) + 1,
+                          'Cached root tabs were not invalidated after '
+                          'root element was added.')
+
+    def test_getRootTabs_stale(self):
+        self.purgeContent()
+        self.setupContent(self.portal)
+        self.assertEquals(len(self.panel.getRootTabs()), 2)
+        # uncatalog root element without any content events, as if it
+        # was removed on another ZEO client
+        catalog = getToolByName(self.portal, 'portal_catalog')
+        catalog.uncatalog_object('/'.join(self.portal.folder1.
+                                          getPhysicalPath()))
+        tabs = self.panel.getRootTabs()
+        self.assertEquals(tabs.ids(), ['document1'])
+        self.assertEquals([t['id'] for t in tabs], ['document1'])
+
+    def test_getRootTabs_lazy(self):
+        self.purgeContent()
+        self.setupContent(self.portal)
+        tabs = self.panel.getRootTabs()
+        self.assertEquals(tabs.ids(), ['folder1', 'document1'])
+        self.assertEquals(tabs._items, {},
+                          'Root tabs should not be converted before access.')
+        self.assertEquals(tabs[0]['name'], 'Folder #1')
+        self.assertEquals(len(tabs._items), 1)
+        self.assertEquals([t['id'] for t in tabs], tabs.ids())
+        self.assertEquals(len(tabs._items), 2)
+
     def test_getCategories(self):
         method = self.panel.getCategories
         # purge any default portal actions
@@ -573,11 +1016,34 @@ class TestControlPanelAPIMethods(PloneTabsTestCase):
         self.assertEquals(len(method()), 2,
                           'There should be 2 portal tabs.')
 
-        # add content
+        # add content, portal tabs are memoized for the request
         self.setupContent(self.portal)
+        self.assertEquals(len(method()), 2,
+                          'Portal tabs should be computed once per request.')
+        self.purgeCache(self.portal.REQUEST)
         self.assertEquals(len(method()), 4,
                           'There should be 4 portal tabs.')
 
+    def test_portal_tabs_invalidation(self):
+        method = self.panel.portal_tabs
+        self.purgeContent()
+        self.purgeActions()
+        self.setupActions(self.tool)
+        self.purgeCache(self.portal.REQUEST)
+        tabs = method()
+        self.failUnless(method() is tabs,
+                        'Portal tabs are not memoized for the request.')
+
+        # changing actions through configlet forgets memoized tabs
+        self.panel.addAction('portal_tabs', {'id': 'id1', 'title': 'Test'})
+        self.assertEquals(len(method()), 3,
+                          'Memoized portal tabs were not invalidated after '
+                          'action was added.')
+        self.panel.deleteAction('id1', 'portal_tabs')
+        self.assertEquals(len(method()), 2,
+                          'Memoized portal tabs were not invalidated after '
+                          'action was deleted.')
+
     def test_selected_portal_tab(self):
         self.assertEquals(self.panel.selected_portal_tab(), 'index_html',
                           'index_html is not selected tab while being on '
@@ -701,11 +1167,60 @@ class TestControlPanelManageMethods(PloneTabsTestCase):
         self.assertEquals(self.tool.portal_tabs.getObjectPosition('home'), 1)
 
 
+class TestActionsListBenchmark(PloneTabsTestCase):
+    """Compare rendering of actions list with the nested template it was
+    rendered by before rows were introduced
+    """
+
+    def afterSetUp(self):
+        super(TestActionsListBenchmark, self).afterSetUp()
+        self.loginAsPortalOwner()
+        panel = getMultiAdapter((self.portal, self.portal.REQUEST),
+                                name='plonetabs-controlpanel')
+        self.panel = panel.__of__(self.portal)
+        self.tool = getToolByName(self.portal, 'portal_actions')
+        self.purgeActions()
+        addActions(self.tool.portal_tabs, BENCHMARK_ACTIONS)
+
+    def _time(self, render):
+        # the best of three attempts
+        best = None
+        for attempt in range(3):
+            start = time.time()
+            render()
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best
+
+    def test_getActionsList(self):
+        panel = self.panel
+
+        def nested():
+            return nested_actionslist(panel, category='portal_tabs',
+                                      errors={})
+
+        def flat():
+            return panel.getActionsList('portal_tabs')
+
+        self.assertEquals(nested().count('class="editform"'),
+                          flat().count('class="editform"'))
+        nested_time = self._time(nested)
+        flat_time = self._time(flat)
+        self.failUnless(flat_time < nested_time,
+                        '%d actions rendered in %.3f seconds, by nested '
+                        'template in %.3f seconds.' % (BENCHMARK_ACTIONS,
+                                                       flat_time,
+                                                       nested_time))
+
+
 def test_suite():
     suite = unittest.TestSuite()
     suite.addTest(unittest.makeSuite(TestControlPanelHelperMethods))
     suite.addTest(unittest.makeSuite(TestControlPanelAPIMethods))
     suite.addTest(unittest.makeSuite(TestControlPanelManageMethods))
+    if BENCHMARKS:
+        suite.addTest(unittest.makeSuite(TestActionsListBenchmark))
 
     # these tests are implemented as Selenium KSS Tests
     # using kss.demo package, and KSS plugins are tested by means of
@@ -0,0 +1,74 @@
+import unittest
+
+from quintagroup.plonetabs.browser.dispatch import HandlersRegistry
+
+
+class DummyView(object):
+
+    def first(self, form):
+        return 'first'
+
+    def second(self, form):
+        return 'second'
+
+
+class TestHandlersRegistry(unittest.TestCase):
+    """Test here configlet form handlers registry"""
+
+    def setUp(self):
+        self.registry = HandlersRegistry(
+            ('first', 'first.button', 'first'),
+            ('second', 'second.button', 'second'),
+        )
+
+    def test_resolveByMarker(self):
+        resolve = self.registry.resolve
+        self.assertEquals(resolve({'first.button': 'Go'}), 'first')
+        self.assertEquals(resolve({'second.button': 'Go', 'id': 'x'}),
+                          'second')
+        self.assertEquals(resolve({'id': 'x'}), None)
+        # the first registered marker wins
+        self.assertEquals(resolve({'second.button': 'Go',
+                                   'first.button': 'Go'}), 'first')
+
+    def test_resolveByOperation(self):
+        resolve = self.registry.resolve
+        self.assertEquals(resolve({'op': 'second', 'first.button': 'Go'}),
+                          'second')
+        self.assertEquals(resolve({'op': 'unknown', 'first.button': 'Go'}),
+                          'first')
+        self.assertEquals(self.registry.lookup('first'), 'first')
+        self.assertEquals(self.registry.lookup('unknown'), None)
+
+    def test_operation(self):
+        operation = self.registry.operation
+        self.assertEquals(operation({'op': 'second'}), 'second')
+        self.assertEquals(operation({'second.button': 'Go'}), 'second')
+        self.assertEquals(operation({'op': 'unknown'}), None)
+
+    def test_register(self):
+        def third(view, form):
+            return 'third:%s' % form['id']
+
+        self.registry.register('third', 'third.button', third)
+        self.assertEquals(sorted(self.registry.operations()),
+                          ['first', 'second', 'third'])
+        form = {'third.button': 'Go', 'id': 'x'}
+        handler = self.registry.resolve(form)
+        self.assertEquals(self.registry.dispatch(DummyView(), handler, form),
+                          'third:x')
+
+        # overriding handler of already registered marker
+        self.registry.register('other', 'first.button', 'second')
+        self.assertEquals(self.registry.resolve({'first.button': 'Go'}),
+                          'second')
+
+    def test_dispatch(self):
+        view = DummyView()
+        self.assertEquals(self.registry.dispatch(view, 'first', {}), 'first')
+
+
+def test_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestHandlersRegistry))
+    return suite
@@ -0,0 +1,292 @@
+import re
+import unittest
+import time
+
+from zope.component import getMultiAdapter
+
+from Products.CMFCore.utils import getToolByName
+from Products.CMFCore.ActionInformation import Action, ActionCategory
+
+from quintagroup.plonetabs import expressions
+from quintagroup.plonetabs.expressions import LRUCache, FoldedExpression
+from quintagroup.plonetabs.tests.base import PloneTabsTestCase
+from quintagroup.plonetabs.tests.benchmarks import BENCHMARKS
+
+
+def compilingFixExpression(expr):
+    """fixExpression the way it was before, compiling pattern every time"""
+    if expr.find('/') == 0:
+        return 'string:${portal_url}%s' % expr
+    elif re.compile('^(ht|f)tps?\\:', re.I).search(expr):
+        return 'string:%s' % expr
+    elif expr.find(':') != -1:
+        return expr
+    else:
+        return 'string:${object_url}/%s' % expr
+
+
+def bestTime(method, exprs):
+    """The best of three times of fixing all expressions"""
+    best = None
+    for attempt in range(3):
+        start = time.time()
+        for expr in exprs:
+            method(expr)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+class TestFixExpression(unittest.TestCase):
+    """Test here normalization of expressions typed by user"""
+
+    def test_getExpressionForm(self):
+        method = expressions.getExpressionForm
+        self.assertEquals(method('/slash'), 'portal')
+        self.assertEquals(method('/slash:colon'), 'portal')
+        self.assertEquals(method('https://test.com'), 'url')
+        self.assertEquals(method('FTP://test.com'), 'url')
+        self.assertEquals(method('python:True'), 'typed')
+        self.assertEquals(method('string:${portal_url}'), 'typed')
+        self.assertEquals(method('hello'), 'object')
+        self.assertEquals(method(''), 'object')
+
+    def test_fixExpression(self):
+        method = expressions.fixExpression
+        self.assertEquals(method('/slash'), 'string:${portal_url}/slash')
+        self.assertEquals(method('https://test.com'),
+                          'string:https://test.com')
+        self.assertEquals(method('python:True'), 'python:True')
+        self.assertEquals(method('hello'), 'string:${object_url}/hello')
+        self.assertEquals(method('100%'), 'string:${object_url}/100%')
+
+    def test_fixExpressionThroughput(self):
+        # cheap relative check, precompiled pattern must not be slower
+        # than pattern compiled on every call as it was before
+        exprs = ['/about', 'http://plone.org', 'python:True',
+                 'folder/page'] * 250
+        fixed = bestTime(expressions.fixExpression, exprs)
+        baseline = bestTime(compilingFixExpression, exprs)
+        self.failUnless(fixed < baseline * 2,
+                        '1000 expressions fixed in %.4f seconds, with '
+                        'compiled on every call pattern in %.4f seconds.'
+                        % (fixed, baseline))
+
+
+class TestFixExpressionBenchmark(unittest.TestCase):
+    """Measure throughput of expressions normalization"""
+
+    def test_fixExpressionThroughput(self):
+        # all forms are recognized with single precompiled pattern, so
+        # thousands of conversions take a few milliseconds
+        method = expressions.fixExpression
+        exprs = ['/about', 'http://plone.org', 'python:True',
+                 'folder/page'] * 5000
+        start = time.time()
+        for expr in exprs:
+            method(expr)
+        elapsed = time.time() - start
+        self.failUnless(elapsed < 1.0,
+                        '20000 expressions fixed in %.3f seconds, '
+                        'fixExpression is too slow.' % elapsed)
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test here bounded cache of compiled expressions"""
+
+    def test_getSet(self):
+        cache = LRUCache(2)
+        self.assertEquals(cache.get('a'), None)
+        self.assertEquals(cache.get('a', 'default'), 'default')
+        cache.set('a', 1)
+        cache.set('a', 2)
+        self.assertEquals(cache.get('a'), 2)
+        self.assertEquals(len(cache), 1)
+
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # 'a' becomes recently used, so 'b' is dropped
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEquals(len(cache), 2)
+        self.failUnless('a' in cache)
+        self.failIf('b' in cache)
+        self.failUnless('c' in cache)
+
+        cache.clear()
+        self.assertEquals(len(cache), 0)
+
+
+class TestCompiledExpressions(unittest.TestCase):
+    """Test here compiled expressions sharing"""
+
+    def setUp(self):
+        expressions.compiled_expressions.clear()
+
+    def test_compileExpression(self):
+        method = expressions.compileExpression
+        compiled = method('string:${portal_url}/test')
+        self.failUnless(method('string:${portal_url}/test') is compiled,
+                        'Expression was compiled twice.')
+
+    def test_compileExpressionError(self):
+        method = expressions.compileExpression
+        self.assertRaises(Exception, method, 'bad_type:test')
+        error = expressions.compiled_expressions.get('bad_type:test')
+        self.failUnless(isinstance(error, Exception),
+                        'Compilation error was not cached.')
+        self.assertRaises(Exception, method, 'bad_type:test')
+
+    def test_makeExpression(self):
+        expr = expressions.makeExpression('string:test')
+        self.assertEquals(expr.text, 'string:test')
+        self.failUnless(expr._v_compiled is
+                        expressions.compileExpression('string:test'))
+        self.assertEquals(expressions.makeExpression('')._v_compiled, None)
+
+    def test_setActionExpression(self):
+        action = Action('test')
+        expressions.setActionExpression(action, 'url_expr', 'string:test')
+        self.assertEquals(action.url_expr, 'string:test')
+        self.failUnless(action.url_expr_object._v_compiled is
+                        expressions.compileExpression('string:test'))
+
+        expressions.setActionExpression(action, 'url_expr', '')
+        self.assertEquals(action.url_expr, '')
+        self.failIf(hasattr(action, 'url_expr_object'))
+
+
+class ExpressionContext(object):
+    """Expression context with given variables"""
+
+    def __init__(self, **kw):
+        self.vars = kw
+
+
+class NavigationRootView(object):
+
+    def navigationRootUrl(self):
+        return 'http://nohost/plone/en'
+
+
+class TestFoldedExpressions(unittest.TestCase):
+    """Test here expressions resolved without TALES engine"""
+
+    def test_classifyExpression(self):
+        method = expressions.classifyExpression
+        self.assertEquals(method('string:${portal_url}/about'),
+                          ('portal', '/about'))
+        self.assertEquals(method('string:${portal_url}'), ('portal', ''))
+        self.assertEquals(method('string:${globals_view/navigationRootUrl}'),
+                          ('navroot', ''))
+        self.assertEquals(method('string:http://plone.org'),
+                          ('constant', 'http://plone.org'))
+        self.assertEquals(method('string:${object_url}/view'), None)
+        self.assertEquals(method('string:${portal_url}/$id'), None)
+        self.assertEquals(method('string:${portal_url}/$$'), None)
+        self.assertEquals(method('python:portal_url'), None)
+        self.assertEquals(method('portal_url'), None)
+
+    def test_call(self):
+        def evaluate(econtext):
+            return 'evaluated'
+        econtext = ExpressionContext(portal_url='http://nohost/plone',
+                                     globals_view=NavigationRootView())
+        portal = FoldedExpression('portal', '/about', evaluate)
+        self.assertEquals(portal(econtext), 'http://nohost/plone/about')
+        navroot = FoldedExpression('navroot', '/news', evaluate)
+        self.assertEquals(navroot(econtext), 'http://nohost/plone/en/news')
+        constant = FoldedExpression('constant', 'http://plone.org', evaluate)
+        self.assertEquals(constant(econtext), 'http://plone.org')
+        # url isn't known, so expression is evaluated with TALES
+        self.assertEquals(portal(ExpressionContext()), 'evaluated')
+        self.assertEquals(navroot(ExpressionContext()), 'evaluated')
+
+    def test_compileExpression(self):
+        expressions.compiled_expressions.clear()
+        compiled = expressions.compileExpression('string:${portal_url}/a')
+        self.failUnless(isinstance(compiled, FoldedExpression))
+        compiled = expressions.compileExpression('string:${object_url}/a')
+        self.failIf(isinstance(compiled, FoldedExpression))
+
+
+class TestFoldedActions(PloneTabsTestCase):
+    """Test here tabs urls resolved without TALES engine"""
+
+    def afterSetUp(self):
+        super(TestFoldedActions, self).afterSetUp()
+        self.loginAsPortalOwner()
+        self.tool = getToolByName(self.portal, 'portal_actions')
+        self.purgeActions()
+        self.purgeCache(self.portal.REQUEST)
+        self.tool._setObject('portal_tabs', ActionCategory('portal_tabs'))
+        category = self.tool.portal_tabs
+        for i in range(50):
+            if i % 2:
+                url_expr = 'string:${portal_url}/tab%d' % i
+            else:
+                url_expr = 'string:http://plone.org/tab%d' % i
+            category._setObject('tab%d' % i,
+                                Action('tab%d' % i, title='Tab %d' % i,
+                                       url_expr=url_expr, visible=True))
+        panel = getMultiAdapter((self.portal, self.portal.REQUEST),
+                                name='plonetabs-controlpanel')
+        self.panel = panel.__of__(self.portal)
+
+    def test_portal_tabs(self):
+        evaluations = []
+
+        def evaluate(econtext):
+            evaluations.append(econtext)
+            raise AssertionError('Folded expression was evaluated.')
+
+        expressions.foldActionsExpressions(
+            self.tool.portal_tabs.objectValues())
+        folded = set([action.url_expr_object._v_compiled
+                      for action in self.tool.portal_tabs.objectValues()])
+        saved = [(expr, expr.compiled) for expr in folded]
+        for expr in folded:
+            self.failUnless(isinstance(expr, FoldedExpression))
+            expr.compiled = evaluate
+        try:
+            tabs = self.panel.portal_tabs()
+        finally:
+            for expr, compiled in saved:
+                expr.compiled = compiled
+
+        self.assertEquals(len(evaluations), 0)
+        urls = dict([(tab['id'], tab['url']) for tab in tabs])
+        self.assertEquals(urls['tab1'], self.portal.absolute_url() + '/tab1')
+        self.assertEquals(urls['tab2'], 'http://plone.org/tab2')
+
+    def test_sharedCompiledExpressions(self):
+        action = self.tool.portal_tabs.tab1
+        action._setPropValue('icon_expr', 'string:${portal_url}/icon.png')
+        action._setPropValue('available_expr', 'python:True')
+        expressions.foldActionsExpressions([action])
+        for name in ('url_expr', 'icon_expr', 'available_expr'):
+            expr = getattr(action, '%s_object' % name)
+            self.failUnless(expr._v_compiled is
+                            expressions.compileExpression(expr.text),
+                            '%s was not compiled with shared cache.' % name)
+
+    def test_badExpression(self):
+        action = self.tool.portal_tabs.tab1
+        action._setPropValue('available_expr', 'bad_type:test')
+        expressions.foldActionsExpressions([action])
+        self.assertEquals(action.available_expr_object._v_compiled, None)
+
+
+def test_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestFixExpression))
+    suite.addTest(unittest.makeSuite(TestLRUCache))
+    suite.addTest(unittest.makeSuite(TestCompiledExpressions))
+    suite.addTest(unittest.makeSuite(TestFoldedExpressions))
+    suite.addTest(unittest.makeSuite(TestFoldedActions))
+    if BENCHMARKS:
+        suite.addTest(unittest.makeSuite(TestFixExpressionBenchmark))
+    return suite
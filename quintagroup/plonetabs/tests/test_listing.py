@@ -0,0 +1,139 @@
+import time
+import unittest
+
+from Products.CMFCore.utils import getToolByName
+from Products.CMFCore.ActionInformation import Action, ActionCategory
+
+from quintagroup.plonetabs.listing import isUnconditional
+from quintagroup.plonetabs.listing import listCategoryActions
+from quintagroup.plonetabs.tests.base import PloneTabsTestCase
+from quintagroup.plonetabs.tests.benchmarks import BENCHMARKS
+
+# number of actions in benchmark category
+ACTIONS = 200
+# number of listings in benchmark
+LISTINGS = 20
+
+
+class ListingTestCase(PloneTabsTestCase):
+    """Fill portal_tabs category with given number of actions"""
+
+    def afterSetUp(self):
+        super(ListingTestCase, self).afterSetUp()
+        self.tool = getToolByName(self.portal, 'portal_actions')
+        self.purgeActions()
+        self.tool._setObject('portal_tabs', ActionCategory('portal_tabs'))
+
+    def addActions(self, number, **kw):
+        category = self.tool.portal_tabs
+        for i in range(number):
+            data = {'title': 'Tab %d' % i,
+                    'url_expr': 'string:${portal_url}/tab%d' % i,
+                    'permissions': ('View', ),
+                    'visible': True}
+            data.update(kw)
+            category._setObject('tab%d' % i, Action('tab%d' % i, **data))
+
+    def stockListing(self):
+        """Actions of category listed by CMF"""
+        actions = self.tool.listFilteredActionsFor(self.portal)
+        return actions.get('portal_tabs', [])
+
+
+class TestListCategoryActions(ListingTestCase):
+    """Test here listing of actions with fast path for unconditional ones"""
+
+    def afterSetUp(self):
+        super(TestListCategoryActions, self).afterSetUp()
+        self.addActions(4)
+        category = self.tool.portal_tabs
+        category.tab1._setPropValue('available_expr', 'python:False')
+        category.tab2._setPropValue('permissions', ('Manage portal', ))
+        category.tab3._setPropValue('visible', False)
+
+    def test_isUnconditional(self):
+        category = self.tool.portal_tabs
+        self.failUnless(isUnconditional(category.tab0))
+        self.failIf(isUnconditional(category.tab1))
+
+    def test_sameAsStock(self):
+        for login in (self.logout, self.loginAsPortalOwner):
+            login()
+            listed = listCategoryActions(self.portal, 'portal_tabs')
+            stock = self.stockListing()
+            self.assertEquals([(a['id'], a['url']) for a in listed],
+                              [(a['id'], a['url']) for a in stock])
+
+    def test_filtered(self):
+        self.logout()
+        listed = listCategoryActions(self.portal, 'portal_tabs')
+        self.assertEquals([a['id'] for a in listed], ['tab0'])
+        self.loginAsPortalOwner()
+        listed = listCategoryActions(self.portal, 'portal_tabs')
+        self.assertEquals([a['id'] for a in listed], ['tab0', 'tab2'])
+
+    def test_subcategories(self):
+        category = self.tool.portal_tabs
+        category._setObject('sub', ActionCategory('sub'))
+        category.sub._setObject('subtab',
+                                Action('subtab', title='Subtab',
+                                       url_expr='string:subtab',
+                                       visible=True))
+        listed = listCategoryActions(self.portal, 'portal_tabs')
+        self.assertEquals([a['id'] for a in listed], ['tab0'])
+        self.assertEquals([(a['id'], a['url']) for a in listed],
+                          [(a['id'], a['url']) for a in self.stockListing()])
+
+    def test_invisibleNotCompiled(self):
+        expr = self.tool.portal_tabs.tab3.url_expr_object
+        listCategoryActions(self.portal, 'portal_tabs')
+        self.failIf(hasattr(expr, '_v_compiled'))
+        expr = self.tool.portal_tabs.tab0.url_expr_object
+        self.failUnless(hasattr(expr, '_v_compiled'))
+
+    def test_missingCategory(self):
+        self.assertEquals(listCategoryActions(self.portal, 'missing'), [])
+
+
+class TestListCategoryActionsBenchmark(ListingTestCase):
+    """Compare listing times of unconditional actions with CMF"""
+
+    def _time(self, listing):
+        # the best of three attempts
+        best = None
+        for attempt in range(3):
+            start = time.time()
+            for i in xrange(LISTINGS):
+                listing()
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best
+
+    def test_unconditionalActions(self):
+        self.addActions(ACTIONS)
+        self.logout()
+
+        def listed():
+            # lazy values are evaluated by template in real page
+            return [(a['url'], a['title'])
+                    for a in listCategoryActions(self.portal, 'portal_tabs')]
+
+        def stock():
+            return [(a['url'], a['title']) for a in self.stockListing()]
+
+        self.assertEquals(listed(), stock())
+        stock_time = self._time(stock)
+        listed_time = self._time(listed)
+        self.failUnless(listed_time < stock_time,
+                        '%d actions listed in %.4f seconds, by CMF in %.4f '
+                        'seconds.' % (ACTIONS, listed_time / LISTINGS,
+                                      stock_time / LISTINGS))
+
+
+def test_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestListCategoryActions))
+    if BENCHMARKS:
+        suite.addTest(unittest.makeSuite(TestListCategoryActionsBenchmark))
+    return suite
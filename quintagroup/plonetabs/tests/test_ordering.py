@@ -0,0 +1,242 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import transaction
+from ZODB import DB
+from ZODB import ConflictResolution
+from ZODB.ConflictResolution import PersistentReference
+from ZODB.FileStorage import FileStorage
+from ZODB.POSException import ConflictError
+
+from Products.CMFCore.ActionInformation import Action, ActionCategory
+
+from quintagroup.plonetabs import ordering
+from quintagroup.plonetabs.ordering import mergeOrder
+from quintagroup.plonetabs.tests.benchmarks import BENCHMARKS
+
+_marker = object()
+
+
+class TestMergeOrder(unittest.TestCase):
+    """Test here three-way merge of actions orderings"""
+
+    def merge(self, old, saved, new):
+        return ''.join(mergeOrder(list(old), list(saved), list(new)))
+
+    def test_independentMoves(self):
+        self.assertEquals(self.merge('abcd', 'bacd', 'abdc'), 'badc')
+        self.assertEquals(self.merge('abcd', 'abcd', 'dabc'), 'dabc')
+
+    def test_additionsAndRemovals(self):
+        self.assertEquals(self.merge('abcd', 'abcde', 'xabcd'), 'xabcde')
+        self.assertEquals(self.merge('abcd', 'abd', 'acd'), 'ad')
+        self.assertEquals(self.merge('abcd', 'bacd', 'bcd'), 'bcd')
+
+    def test_conflicts(self):
+        # the same action moved by both changes
+        self.assertRaises(ConflictError, self.merge, 'abcd', 'dabc', 'adbc')
+        # moved action removed by concurrent change
+        self.assertRaises(ConflictError, self.merge, 'abcd', 'cabd', 'abd')
+        # the same action added by both changes
+        self.assertRaises(ConflictError, self.merge, 'abc', 'abcd', 'dabc')
+
+
+class TestResolveConflict(unittest.TestCase):
+    """Test here resolution of conflicting actions category states"""
+
+    def state(self, ids, **kw):
+        state = {'id': 'category', 'title': ''}
+        state['_objects'] = tuple([{'id': id_, 'meta_type': 'CMF Action'}
+                                   for id_ in ids])
+        for id_ in ids:
+            state[id_] = 'action %s' % id_
+        state.update(kw)
+        return state
+
+    def test_resolve(self):
+        resolve = ordering.resolveOrderingConflict
+        result = resolve(None, self.state('abc'), self.state('bac'),
+                         self.state('abcd', title='Category'))
+        self.assertEquals(result, self.state('bacd', title='Category'))
+
+    def test_persistentReferences(self):
+        # subobjects are referenced in states of conflict resolution
+        def state(ids):
+            result = self.state(ids)
+            for id_ in ids:
+                result[id_] = PersistentReference('oid %s' % id_)
+            return result
+        resolve = ordering.resolveOrderingConflict
+        result = resolve(None, state('abc'), state('abcd'), state('bac'))
+        self.assertEquals([info['id'] for info in result['_objects']],
+                          list('bacd'))
+        self.assertEquals(sorted([id_ for id_ in result if len(id_) == 1]),
+                          list('abcd'))
+        self.assertRaises(ConflictError, resolve, None, state('abc'),
+                          state('abcd'), state('abcd'))
+
+    def test_attributeConflict(self):
+        resolve = ordering.resolveOrderingConflict
+        self.assertRaises(ConflictError, resolve, None, self.state('abc'),
+                          self.state('abc', title='One'),
+                          self.state('abc', title='Two'))
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Actions category in FileStorage database, conflicts of its
+    concurrent changes are resolved by storage
+    """
+
+    actions = 20
+
+    def setUp(self):
+        self.saved_resolver = ActionCategory.__dict__.get(
+            '_p_resolveConflict', _marker)
+        self.tempdir = tempfile.mkdtemp()
+        self.databases = []
+
+    def tearDown(self):
+        for db in self.databases:
+            db.close()
+        shutil.rmtree(self.tempdir)
+        self.restoreResolver()
+
+    def restoreResolver(self):
+        if self.saved_resolver is _marker:
+            if '_p_resolveConflict' in ActionCategory.__dict__:
+                del ActionCategory._p_resolveConflict
+        else:
+            ActionCategory._p_resolveConflict = self.saved_resolver
+        # forget that category was found unresolvable
+        ConflictResolution._unresolvable.pop(ActionCategory, None)
+
+    def openDatabase(self):
+        path = os.path.join(self.tempdir, '%d.fs' % len(self.databases))
+        db = DB(FileStorage(path))
+        self.databases.append(db)
+        tm = transaction.TransactionManager()
+        conn = db.open(transaction_manager=tm)
+        category = ActionCategory('category')
+        for i in range(self.actions):
+            category._setObject('action%d' % i, Action('action%d' % i),
+                                set_owner=0)
+        conn.root()['category'] = category
+        tm.commit()
+        conn.close()
+        return db
+
+
+class TestConcurrentChanges(DatabaseTestCase):
+    """Test here resolution of conflicts by database"""
+
+    def test_addAndMove(self):
+        ordering.installConflictResolution()
+        db = self.openDatabase()
+        adding, moving = [transaction.TransactionManager() for i in (1, 2)]
+        conn1 = db.open(transaction_manager=adding)
+        conn2 = db.open(transaction_manager=moving)
+        conn1.root()['category']._setObject('added', Action('added'),
+                                            set_owner=0)
+        conn2.root()['category'].moveObjectToPosition('action3', 0)
+        adding.commit()
+        moving.commit()
+        conn1.close()
+        conn2.close()
+
+        tm = transaction.TransactionManager()
+        conn = db.open(transaction_manager=tm)
+        category = conn.root()['category']
+        ids = category.objectIds()
+        self.assertEquals(len(ids), self.actions + 1)
+        self.assertEquals(ids[0], 'action3')
+        self.assertEquals(ids[-1], 'added')
+        self.assertEquals(category._getOb('added').getId(), 'added')
+        conn.close()
+
+
+class TestConcurrentReordering(DatabaseTestCase):
+    """Stress test concurrent changes of actions category"""
+
+    threads = 4
+    operations = 20
+
+    def stress(self):
+        """Move and add actions in concurrent threads, check resulting
+        category and return number of conflicts
+        """
+        db = self.openDatabase()
+        conflicts = []
+        expected = set(['action%d' % i for i in range(self.actions)])
+
+        def worker(number):
+            tm = transaction.TransactionManager()
+            conn = db.open(transaction_manager=tm)
+            try:
+                for i in range(self.operations):
+                    while True:
+                        category = conn.root()['category']
+                        if i % 2:
+                            category.moveObjectToPosition(
+                                'action%d' % number,
+                                (number + i) % self.actions)
+                        else:
+                            id_ = 'added_%d_%d' % (number, i)
+                            category._setObject(id_, Action(id_),
+                                                set_owner=0)
+                        # give other threads chance to commit
+                        time.sleep(0.001)
+                        try:
+                            tm.commit()
+                            break
+                        except ConflictError:
+                            tm.abort()
+                            conflicts.append(number)
+            finally:
+                tm.abort()
+                conn.close()
+
+        for number in range(self.threads):
+            expected.update(['added_%d_%d' % (number, i)
+                             for i in range(0, self.operations, 2)])
+        threads = [threading.Thread(target=worker, args=(number, ))
+                   for number in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        tm = transaction.TransactionManager()
+        conn = db.open(transaction_manager=tm)
+        category = conn.root()['category']
+        ids = category.objectIds()
+        self.assertEquals(len(ids), len(set(ids)))
+        self.assertEquals(set(ids), expected)
+        for id_ in ids:
+            self.failUnless(category._getOb(id_).getId() == id_)
+        conn.close()
+        return len(conflicts)
+
+    def test_stress(self):
+        # resolver must be tested first, classes without it are cached
+        # by ZODB as unresolvable
+        ordering.installConflictResolution()
+        resolved = self.stress()
+        del ActionCategory._p_resolveConflict
+        unresolved = self.stress()
+        self.failUnless(resolved < unresolved,
+                        '%d conflicts with resolution, %d without it.'
+                        % (resolved, unresolved))
+
+
+def test_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestMergeOrder))
+    suite.addTest(unittest.makeSuite(TestResolveConflict))
+    suite.addTest(unittest.makeSuite(TestConcurrentChanges))
+    if BENCHMARKS:
+        suite.addTest(unittest.makeSuite(TestConcurrentReordering))
+    return suite
@@ -0,0 +1,96 @@
+import sys
+import time
+import unittest
+
+from zope.traversing.adapters import traversePathElement
+
+from quintagroup.plonetabs.browser.rows import ActionRow, RootTabRow
+from quintagroup.plonetabs.tests.benchmarks import BENCHMARKS
+
+# numbers of rows used in benchmarks
+SIZES = (1000, 10000, 100000)
+
+
+def makeRootTabs(size):
+    return [RootTabRow(id='tab%d' % i,
+                       name='Tab %d' % i,
+                       url='http://nohost/plone/tab%d' % i,
+                       description='',
+                       exclude_from_nav=bool(i % 2))
+            for i in xrange(size)]
+
+
+class TestRows(unittest.TestCase):
+    """Test here immutable rows of configlet lists"""
+
+    def setUp(self):
+        self.row = ActionRow(id='home', title='Home', visible=True,
+                             path='/plone/portal_actions/portal_tabs/home')
+
+    def test_access(self):
+        row = self.row
+        self.assertEquals(row.id, 'home')
+        self.assertEquals(row['title'], 'Home')
+        self.assertEquals(row.description, None)
+        self.assertEquals(row.get('unknown', 'default'), 'default')
+        self.assertRaises(KeyError, row.__getitem__, 'unknown')
+        # path isn't a data field
+        self.failIf('path' in row)
+        self.assertEquals(len(row.keys()), 7)
+        self.assertEquals(dict(row.items())['visible'], True)
+
+    def test_immutable(self):
+        self.assertRaises(AttributeError, setattr, self.row, 'id', 'other')
+        self.assertRaises(AttributeError, delattr, self.row, 'id')
+        self.assertRaises(AttributeError, setattr, self.row, 'other', 1)
+        self.assertRaises(TypeError, ActionRow, unknown=1)
+
+    def test_equality(self):
+        same = ActionRow(id='home', title='Home', visible=True,
+                         path='/plone/portal_actions/portal_tabs/home')
+        self.assertEquals(self.row, same)
+        self.assertNotEquals(self.row, ActionRow(id='home'))
+        self.assertNotEquals(self.row, dict(self.row.items()))
+
+    def test_memory(self):
+        # compared with dictionaries used for list items before
+        rows = makeRootTabs(100)
+        rows_size = sum([sys.getsizeof(row) for row in rows])
+        dicts_size = sum([sys.getsizeof(dict(row.items())) for row in rows])
+        self.failUnless(rows_size * 2 < dicts_size,
+                        'Rows take %d bytes, dictionaries take %d bytes.'
+                        % (rows_size, dicts_size))
+
+
+class TestRowsBenchmark(unittest.TestCase):
+    """Compare rows with dictionaries used for list items before"""
+
+    def _traverse(self, items):
+        # the way page templates evaluate 'tab/name' path expression
+        best = None
+        for attempt in range(3):
+            start = time.time()
+            for item in items:
+                traversePathElement(item, 'name', ())
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best
+
+    def test_templateAccess(self):
+        for size in SIZES:
+            rows = makeRootTabs(size)
+            dicts = [dict(row.items()) for row in rows]
+            rows_time = self._traverse(rows)
+            dicts_time = self._traverse(dicts)
+            self.failUnless(rows_time < dicts_time,
+                            '%d rows traversed in %.3f seconds, dictionaries '
+                            'in %.3f seconds.' % (size, rows_time, dicts_time))
+
+
+def test_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestRows))
+    if BENCHMARKS:
+        suite.addTest(unittest.makeSuite(TestRowsBenchmark))
+    return suite
@@ -0,0 +1,91 @@
+import random
+import unittest
+
+from quintagroup.plonetabs.tabstrie import TabsTrie
+
+PORTAL_URL = 'http://nohost/plone'
+
+
+def linearSelected(portal_url, tabs, url, default_tab='index_html'):
+    """Selected tab the way selectedTabs of global sections viewlet
+    finds it, comparing URL with every tab
+    """
+    path = url[len(portal_url):]
+    valid_actions = []
+    for tab in tabs:
+        if not tab['url'].startswith(portal_url):
+            continue
+        action_path = tab['url'][len(portal_url):]
+        if not action_path.startswith('/'):
+            action_path = '/' + action_path
+        if path.startswith(action_path + '/'):
+            valid_actions.append((len(action_path), tab['id']))
+    valid_actions.sort()
+    if valid_actions:
+        return valid_actions[-1][1]
+    return default_tab
+
+
+def makeTab(id_, path, portal_url=PORTAL_URL):
+    return {'id': id_, 'url': portal_url + path}
+
+
+class TestTabsTrie(unittest.TestCase):
+    """Test here selection of portal tab by URL"""
+
+    tabs = (makeTab('index_html', ''),
+            makeTab('news', '/news'),
+            makeTab('events', '/news/events'),
+            makeTab('aggregator', '/news/aggregator/'),
+            makeTab('about', '/about'),
+            makeTab('external', '/news', 'http://example.com'),
+            makeTab('Members', 'Members'))
+
+    urls = ('/', '/news', '/news/', '/news/view', '/news/events/view',
+            '/newsletter/view', '/news/aggregator/view',
+            '/news/aggregator//view', '/about/contact/view', '/Members/x',
+            '/unknown/view', '//view', '')
+
+    def test_selected(self):
+        trie = TabsTrie(PORTAL_URL, self.tabs)
+        self.assertEquals(trie.selected(PORTAL_URL + '/news/view'), 'news')
+        self.assertEquals(trie.selected(PORTAL_URL + '/news/events/x'),
+                          'events')
+        self.assertEquals(trie.selected(PORTAL_URL + '/news'), 'index_html')
+        self.assertEquals(trie.selected(PORTAL_URL + '/x', 'default'),
+                          'default')
+
+    def test_sameAsLinear(self):
+        trie = TabsTrie(PORTAL_URL, self.tabs)
+        for path in self.urls:
+            url = PORTAL_URL + path
+            self.assertEquals(trie.selected(url),
+                              linearSelected(PORTAL_URL, self.tabs, url),
+                              'Different tab selected for %s.' % url)
+
+    def test_samePath(self):
+        # the greatest id wins, as after sorting of (length, id) pairs
+        tabs = (makeTab('b', '/news'), makeTab('a', '/news'))
+        trie = TabsTrie(PORTAL_URL, tabs)
+        self.assertEquals(trie.selected(PORTAL_URL + '/news/view'), 'b')
+
+    def test_random(self):
+        rand = random.Random(23)
+        segments = ('a', 'b', 'c', '')
+        paths = ['/' + '/'.join([rand.choice(segments)
+                                 for i in range(rand.randint(0, 4))])
+                 for j in range(200)]
+        tabs = [makeTab('tab%d' % i, path)
+                for i, path in enumerate(paths[:50])]
+        trie = TabsTrie(PORTAL_URL, tabs)
+        for path in paths:
+            url = PORTAL_URL + path
+            self.assertEquals(trie.selected(url),
+                              linearSelected(PORTAL_URL, tabs, url),
+                              'Different tab selected for %s.' % url)
+
+
+def test_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestTabsTrie))
+    return suite
@@ -0,0 +1,62 @@
+import unittest
+
+from zope.interface import Interface
+from zope.component import getGlobalSiteManager
+from zope.publisher.interfaces.browser import IDefaultBrowserLayer
+from zope.publisher.interfaces.browser import IBrowserView
+from zope.viewlet.interfaces import IViewlet, IViewletManager
+from zope.viewlet.viewlet import ViewletBase
+
+from quintagroup.plonetabs import utils
+from quintagroup.plonetabs.tests.base import PloneTabsTestCase
+
+
+class TestViewletsIndex(PloneTabsTestCase):
+    """Test here viewlet registrations look-up"""
+
+    def test_getViewletByName(self):
+        method = utils.getViewletByName
+        reg = method('plone.global_sections')
+        self.failIf(reg is None, 'There is no plone.global_sections viewlet '
+                    'registration found.')
+        self.assertEquals(reg.name, 'plone.global_sections')
+        self.failUnless(reg.provided is IViewlet)
+        self.assertEquals(method('notexistent_viewlet'), None,
+                          'There should be no registration for not existed '
+                          'viewlet.')
+
+    def test_indexSharedBetweenLookups(self):
+        utils._viewlets_index.clear()
+        utils.getViewletByName('plone.global_sections')
+        self.assertEquals(len(utils._viewlets_index), 1,
+                          'Viewlets index was not built on first look-up.')
+        index = utils._viewlets_index.values()[0]
+        utils.getViewletByName('plone.path_bar')
+        self.failUnless(utils._viewlets_index.values()[0] is index,
+                        'Viewlets index should not be rebuilt between '
+                        'look-ups.')
+
+    def test_indexInvalidation(self):
+        self.assertEquals(utils.getViewletByName('test_viewlet'), None)
+
+        gsm = getGlobalSiteManager()
+        required = (Interface, IDefaultBrowserLayer, IBrowserView,
+                    IViewletManager)
+        gsm.registerAdapter(ViewletBase, required, IViewlet,
+                            name=u'test_viewlet')
+        try:
+            self.failIf(utils.getViewletByName('test_viewlet') is None,
+                        'Viewlets index was not invalidated after new '
+                        'viewlet registration.')
+        finally:
+            gsm.unregisterAdapter(ViewletBase, required, IViewlet,
+                                  name=u'test_viewlet')
+        self.assertEquals(utils.getViewletByName('test_viewlet'), None,
+                          'Viewlets index was not invalidated after '
+                          'viewlet unregistration.')
+
+
+def test_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestViewletsIndex))
+    return suite
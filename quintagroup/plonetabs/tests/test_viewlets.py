@@ -0,0 +1,133 @@
+import time
+import unittest
+
+from zope.component import getMultiAdapter
+
+from plone.app.layout.viewlets.common import GlobalSectionsViewlet
+from plone.memoize.ram import global_cache
+
+from Products.CMFCore.utils import getToolByName
+
+from quintagroup.plonetabs.cache import bumpActionsGeneration
+from quintagroup.plonetabs.cache import roottabs_counter, tabsCacheKey
+from quintagroup.plonetabs.browser.viewlets import CachedGlobalSectionsViewlet
+from quintagroup.plonetabs.tests.base import PloneTabsTestCase
+from quintagroup.plonetabs.tests.benchmarks import BENCHMARKS
+
+# number of renderings in benchmark
+RENDERINGS = 200
+
+
+class SectionsTestCase(PloneTabsTestCase):
+    """Render global sections with our testing actions"""
+
+    def afterSetUp(self):
+        super(SectionsTestCase, self).afterSetUp()
+        self.tool = getToolByName(self.portal, 'portal_actions')
+        self.purgeActions()
+        self.setupActions(self.tool)
+        # generation is reverted along with aborted test transactions
+        global_cache.invalidateAll()
+
+    def render(self, factory=CachedGlobalSectionsViewlet):
+        request = self.portal.REQUEST
+        view = getMultiAdapter((self.portal, request), name='plone')
+        viewlet = factory(self.portal, request, view, None)
+        viewlet = viewlet.__of__(self.portal)
+        viewlet.update()
+        return viewlet.render()
+
+
+class TestCachedGlobalSections(SectionsTestCase):
+    """Test here global sections viewlet rendered from RAM cache"""
+
+    def test_render(self):
+        self.assertEquals(self.render(),
+                          self.render(GlobalSectionsViewlet))
+
+    def test_cache(self):
+        action = self.tool.portal_tabs.objectValues()[0]
+        self.failUnless('Our home' in self.render())
+        # change action without any events
+        action.title = 'Changed'
+        self.failUnless('Our home' in self.render(),
+                        'Global sections were not cached.')
+        bumpActionsGeneration(self.portal)
+        self.failUnless('Changed' in self.render(),
+                        'Cached global sections were not invalidated.')
+
+    def test_cacheKey(self):
+        request = self.portal.REQUEST
+        view = getMultiAdapter((self.portal, request), name='plone')
+        viewlet = CachedGlobalSectionsViewlet(self.portal, request, view)
+        viewlet = viewlet.__of__(self.portal)
+        self.loginAsPortalOwner()
+        viewlet.update()
+        owner_key = viewlet.cache_key
+        self.logout()
+        viewlet.update()
+        self.assertNotEquals(viewlet.cache_key, owner_key)
+        self.failUnless((('Anonymous', ), (), None) in viewlet.cache_key)
+
+    def test_membersCacheKey(self):
+        membership = getToolByName(self.portal, 'portal_membership')
+        membership.addMember('member2', 'secret', ['Member'], [])
+        self.setupContent(self.portal)
+        self.login()
+        member_key = tabsCacheKey(self.portal, self.portal.REQUEST)
+        self.login('member2')
+        self.assertEquals(tabsCacheKey(self.portal, self.portal.REQUEST),
+                          member_key,
+                          'Members with the same roles should share tabs.')
+        # root item shared with the member directly
+        self.loginAsPortalOwner()
+        self.portal.folder1.manage_setLocalRoles('member2', ['Reader'])
+        self.portal.folder1.reindexObjectSecurity()
+        # catalogs older than ZCatalog 2.13 have no counter to notice it
+        roottabs_counter.bump()
+        self.login('member2')
+        self.assertNotEquals(tabsCacheKey(self.portal, self.portal.REQUEST),
+                             member_key)
+
+    def test_typesUseViewActionInListings(self):
+        key = tabsCacheKey(self.portal, self.portal.REQUEST)
+        site_props = getToolByName(self.portal,
+                                   'portal_properties').site_properties
+        site_props.manage_changeProperties(
+            typesUseViewActionInListings=('Folder', ))
+        self.assertNotEquals(tabsCacheKey(self.portal, self.portal.REQUEST),
+                             key)
+
+
+class TestCachedGlobalSectionsBenchmark(SectionsTestCase):
+    """Compare anonymous rendering rates of cached and stock viewlets"""
+
+    def _rate(self, factory):
+        # renderings per second, the best of three attempts
+        best = None
+        for attempt in range(3):
+            start = time.time()
+            for i in xrange(RENDERINGS):
+                self.render(factory)
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return RENDERINGS / best
+
+    def test_anonymousRate(self):
+        self.setupContent(self.portal)
+        self.logout()
+        stock_rate = self._rate(GlobalSectionsViewlet)
+        cached_rate = self._rate(CachedGlobalSectionsViewlet)
+        self.failUnless(cached_rate > stock_rate * 2,
+                        'Cached viewlet is rendered %.1f times per second, '
+                        'stock viewlet %.1f times per second.'
+                        % (cached_rate, stock_rate))
+
+
+def test_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestCachedGlobalSections))
+    if BENCHMARKS:
+        suite.addTest(unittest.makeSuite(TestCachedGlobalSectionsBenchmark))
+    return suite
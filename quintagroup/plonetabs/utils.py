@@ -2,10 +2,19 @@
 from Acquisition import aq_inner
 
 from plone.app.customerize import registration
+from plone.browserlayer.interfaces import ILocalBrowserLayerType
 
+from zope.component import adapter, getAllUtilitiesRegisteredFor
+from zope.component.interfaces import IRegistrationEvent
 from zope.publisher.interfaces.browser import IBrowserRequest
 from zope.viewlet.interfaces import IViewlet
 
+# Viewlet registrations indexed by name, one index per set of local
+# browser layers (registration.getViews takes them into account).
+# Shared between requests and dropped whenever component registrations
+# change, including five.customerize through-the-web customizations.
+_viewlets_index = {}
+
 
 # TODO: Methods 'getViewletByName' and 'setupViewletByName' were copied from
 # https://github.com/collective/collective.developermanual/blob/master/source/
@@ -14,6 +23,22 @@ from zope.viewlet.interfaces import IViewlet
 # (http://svn.plone.org/svn/collective/collective.fastview/trunk/)
 # which has not yet included in plone.
 
+def _buildViewletIndex():
+    """ Walk view registrations once and index viewlets by their name.
+
+    @return: dictionary with viewlet names as keys and registration
+             objects as values
+    """
+    index = {}
+    for v in registration.getViews(IBrowserRequest):
+        # Note that we might have conflicting BrowserView with the
+        # same name, thus we need to check for provided
+        if v.provided == IViewlet and v.name not in index:
+            # keep the first registration, as linear look-up did
+            index[v.name] = v
+    return index
+
+
 def getViewletByName(name):
     """ Viewlets allow through-the-web customizations.
 
@@ -22,17 +47,17 @@ def getViewletByName(name):
 
     @return: Viewlet registration object
     """
-    views = registration.getViews(IBrowserRequest)
-
-    for v in views:
+    key = frozenset(getAllUtilitiesRegisteredFor(ILocalBrowserLayerType))
+    index = _viewlets_index.get(key)
+    if index is None:
+        index = _viewlets_index[key] = _buildViewletIndex()
+    return index.get(name)
 
-        if v.provided == IViewlet:
-            # Note that we might have conflicting BrowserView with the
-            # same name, thus we need to check for provided
-            if v.name == name:
-                return v
 
-    return None
+@adapter(IRegistrationEvent)
+def invalidateViewletIndex(event):
+    """ Drop viewlets index after any component (un)registration """
+    _viewlets_index.clear()
 
 
 def setupViewletByName(view, context, request, name):